@@ -1,19 +1,204 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import (Flask, render_template, request, jsonify, session, redirect, url_for, g, Response,
+                   stream_with_context, has_request_context)
 from flask_cors import CORS
+from markupsafe import escape
 import sqlite3
 import os
 import random
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 import hashlib
 import re
+import json
+import base64
+import csv
+import io
+import unicodedata
+import bisect
+import math
+import zlib
+import mimetypes
+import threading
+import time
+import atexit
+import multiprocessing
+import signal
+import socket
+from array import array
+from contextlib import contextmanager
+from functools import wraps
+from collections import Counter, deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import click
+from werkzeug.serving import make_server, WSGIRequestHandler
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here-change-in-production'
 CORS(app)
 
+# 生产模式：默认工作进程数、优雅退出最长等待时间（秒）、空闲长连接的超时（秒）
+SERVE_WORKERS = os.cpu_count() or 1
+SERVE_GRACEFUL_TIMEOUT = 30
+SERVE_KEEPALIVE_TIMEOUT = 5
+# 工作进程启动后不到 SERVE_MIN_UPTIME 秒就退出时，重新拉起前的等待从 SERVE_RESPAWN_DELAY 秒起翻倍，最长 SERVE_RESPAWN_MAX_DELAY 秒
+SERVE_MIN_UPTIME = 5
+SERVE_RESPAWN_DELAY = 0.5
+SERVE_RESPAWN_MAX_DELAY = 30
+
 # 管理员密码
 ADMIN_PASSWORD = "your-password-here"
 
+# 数据库文件路径，可通过环境变量 SENTENCES_DB 指定
+DATABASE = os.environ.get('SENTENCES_DB', 'sentences.db')
+
+# 慢查询阈值（秒），超过时记录日志；设为 0 关闭慢查询日志
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.1))
+
+# /metrics 除管理员登录外，也接受 Authorization: Bearer <METRICS_TOKEN>，供 Prometheus 抓取
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# 请求和 SQL 耗时直方图的分桶上界（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 读快照模式：公开的只读接口从内存中的数据库副本读取；写入后最多等待多少秒再重建快照（合并连续写入）
+READ_SNAPSHOT = os.environ.get('READ_SNAPSHOT', '0') == '1'
+READ_SNAPSHOT_DEBOUNCE = float(os.environ.get('READ_SNAPSHOT_DEBOUNCE', 1))
+
+# JSON 响应压缩：超过多少字节才压缩，压缩级别 1-9（越高越省流量、越耗 CPU）
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+# 带指纹的静态文件内容不会变化，可以长期缓存
+STATIC_MAX_AGE = 365 * 24 * 3600
+STATIC_COMPRESSIBLE = ('.js', '.css', '.html', '.svg', '.json', '.txt')
+
+# 公开接口按客户端IP和接口分组限流（令牌桶）：分组 -> (桶容量, 每秒补充的令牌数)
+# 可通过环境变量 RATE_LIMITS 以 JSON 覆盖，如 {"search": [10, 1]}；分组设为 null 则不限流
+RATE_LIMITS = {
+    'random': (30, 5),
+    'search': (20, 2),
+    'stats': (30, 5),
+    'export': (3, 0.05),
+    'submit': (5, 0.2),
+}
+RATE_LIMITS.update(json.loads(os.environ.get('RATE_LIMITS', '{}')))
+
+
+def check_rate_limits(limits):
+    """校验限流配置：桶容量至少为 1（否则永远拿不到令牌），补充速率必须大于 0（计算等待时间时作除数）"""
+    for group, limit in limits.items():
+        if limit is None:
+            continue
+        if (not isinstance(limit, (list, tuple)) or len(limit) != 2 or
+                not all(isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+                        for value in limit) or
+                limit[0] < 1 or not limit[1] > 0):
+            raise ValueError(f'RATE_LIMITS 中分组 {group} 的配置无效: {limit!r}，应为 [桶容量(>=1), 每秒补充数(>0)] 或 null')
+
+
+check_rate_limits(RATE_LIMITS)
+
+# 视图函数 -> 限流分组
+RATE_LIMIT_GROUPS = {
+    'get_random_sentence': 'random',
+    'get_multiple_random_sentences': 'random',
+    'get_random_batch': 'random',
+    'search_sentences': 'search',
+    'get_stats': 'stats',
+    'get_stats_history': 'stats',
+    'get_leaderboard': 'stats',
+    'export_sentences': 'export',
+    'get_changes': 'export',
+    'submit_sentence': 'submit',
+}
+
+# 内存中最多保留多少个令牌桶，超过时淘汰最久未访问的
+RATE_LIMIT_MAX_BUCKETS = 10000
+
+# 每个进程同时处理的请求数上限，超过时直接返回 503，不排队
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 64))
+
+# 连接池中最多保留的空闲连接数
+DB_POOL_SIZE = 8
+
+# 每个连接建立时执行的 PRAGMA
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),  # 读写并发，读不阻塞写
+    ('synchronous', 'NORMAL'),  # WAL 模式下足够安全，少一次 fsync
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),  # 负数单位为 KiB，约 16MB
+    ('busy_timeout', 5000),  # 毫秒，遇到写锁时等待而不是直接报 database is locked
+)
+
+# 每个连接缓存的预编译语句数量
+SQLITE_CACHED_STATEMENTS = 256
+
+# SQLite INTEGER 的最大值，超出范围的参数在绑定时会抛出 OverflowError
+SQLITE_MAX_INTEGER = 2 ** 63 - 1
+
+# 随机语句ID池的同步间隔（秒），超时后按变更日志同步增量，兜底直接修改数据库的情况
+APPROVED_POOL_MAX_AGE = 300
+
+# 访问计数写回缓冲：每隔多少秒、或累计多少次增量后批量写入数据库
+COUNTER_FLUSH_INTERVAL = 5
+COUNTER_FLUSH_THRESHOLD = 200
+
+# 按小时、按接口的访问量：小时数据保留多少天，之后汇总为按天数据；历史查询最多返回多少个点
+USAGE_HOURLY_RETENTION_DAYS = 30
+USAGE_HISTORY_MAX_POINTS = 2000
+
+# 用户投稿先写入独立的队列库，由后台线程每隔多少秒、每批最多多少条审核入库
+SUBMISSION_QUEUE_DB = os.environ.get('SUBMISSION_QUEUE_DB', DATABASE + '.queue')
+SUBMISSION_DRAIN_INTERVAL = 1
+SUBMISSION_BATCH_SIZE = 200
+SUBMISSION_MAX_ATTEMPTS = 5  # 单条投稿连续处理失败这么多次后移出队列
+
+# 搜索每页默认/最大返回条数
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+
+# 排行榜在内存中缓存的名次数（更多名次直接查汇总表），以及缓存的有效期（秒）
+LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARD_CACHE_TTL = 10
+
+# 排行榜中不统计的署名
+LEADERBOARD_EXCLUDED_AUTHORS = ('匿名', '系统')
+
+# 管理后台语句列表每页默认/最大条数
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+# 关键词回溯扫描：每块多少条语句交给一个子进程；语句数不超过一块时直接在本进程扫描
+RESCAN_CHUNK_SIZE = 2000
+RESCAN_WORKERS = os.cpu_count() or 1
+# 子进程的启动方式：forkserver 不继承 fork 时其他线程持有的锁，没有 forkserver 的平台（Windows）用 spawn
+RESCAN_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# 批量操作一次最多处理的ID数，批量导入每块写入的行数
+BATCH_MAX_IDS = 5000
+IMPORT_CHUNK_SIZE = 500
+
+# 近似重复判定：SimHash 汉明距离不超过该值视为近似重复（64位指纹分4段，每段16位）
+NEAR_DUPLICATE_DISTANCE = 3
+SIMHASH_BANDS = 4
+# 管理后台近似重复分组：每次请求最多扫描多少条指纹，一组最多展开多少条语句
+DUPLICATE_SCAN_SIZE = 1000
+DUPLICATE_CLUSTER_MAX_SIZE = 100
+
+# 只读接口的 Cache-Control max-age（秒）
+STATS_MAX_AGE = 10
+LEADERBOARD_MAX_AGE = 30
+
+# 首页服务端渲染用的随机语句缓存：缓存条数和有效期（秒）
+INDEX_SENTENCE_CACHE_SIZE = 50
+INDEX_CACHE_TTL = 60
+
+# 语句长度分级（与前端 adjustFontSize 一致）：(类名, 最大长度)，超过最后一级为 very-long
+LENGTH_CLASSES = (('short', 20), ('medium', 50), ('long', 100))
+
+# 变更订阅每次最多返回的条数；导出时每攒够多少行输出一次
+CHANGES_MAX_LIMIT = 1000
+EXPORT_CHUNK_ROWS = 500
+
 # 默认关键词配置
 DEFAULT_KEYWORDS = {
     'error': [
@@ -27,9 +212,344 @@ DEFAULT_KEYWORDS = {
 }
 
 
+class Histogram:
+    """按标签分组的耗时直方图（Prometheus 格式）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series = {}  # 标签 -> [各分桶计数..., 总和]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, name, label_names):
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{key}="{prometheus_escape(value)}"' for key, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label_text}}} {series[-1]:.6f}')
+            lines.append(f'{name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def prometheus_escape(value):
+    """转义 Prometheus 标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """请求和 SQL 的运行指标：按路由的耗时直方图、状态码计数、进行中的请求数，按语句类型的 SQL 耗时"""
+
+    def __init__(self, slow_query_threshold=SLOW_QUERY_THRESHOLD):
+        self.slow_query_threshold = slow_query_threshold
+        self._lock = threading.Lock()
+        self._requests = Histogram()  # (方法, 路由)
+        self._request_sql = Histogram()  # (方法, 路由)：每个请求内 SQL 耗时合计
+        self._statuses = Counter()  # (方法, 路由, 状态码)
+        self._sql = Histogram()  # (语句类型,)
+        self._slow_queries = 0
+        self.in_flight = 0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method, route, status, elapsed, sql_elapsed):
+        with self._lock:
+            self.in_flight -= 1
+            self._requests.observe((method, route), elapsed)
+            self._request_sql.observe((method, route), sql_elapsed)
+            self._statuses[(method, route, str(status))] += 1
+
+    def observe_sql(self, sql, elapsed):
+        operation = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'EMPTY'
+        slow = self.slow_query_threshold and elapsed >= self.slow_query_threshold
+        with self._lock:
+            self._sql.observe((operation,), elapsed)
+            if slow:
+                self._slow_queries += 1
+
+        if has_request_context():
+            g.sql_elapsed = g.get('sql_elapsed', 0.0) + elapsed
+        if slow:
+            app.logger.warning('慢查询 %.1fms %s: %s', elapsed * 1000,
+                               request.path if has_request_context() else '-', ' '.join(sql.split()))
+
+    def render(self, extra=()):
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            lines = [
+                '# HELP sentences_http_requests_in_flight Requests currently being served.',
+                '# TYPE sentences_http_requests_in_flight gauge',
+                f'sentences_http_requests_in_flight {self.in_flight}',
+                '# HELP sentences_http_request_duration_seconds Request latency by route.',
+                '# TYPE sentences_http_request_duration_seconds histogram',
+                *self._requests.render('sentences_http_request_duration_seconds', ('method', 'route')),
+                '# HELP sentences_http_request_sql_seconds Total SQL time per request by route.',
+                '# TYPE sentences_http_request_sql_seconds histogram',
+                *self._request_sql.render('sentences_http_request_sql_seconds', ('method', 'route')),
+                '# HELP sentences_http_responses_total Responses by route and status code.',
+                '# TYPE sentences_http_responses_total counter',
+            ]
+            for (method, route, status), count in sorted(self._statuses.items()):
+                lines.append(f'sentences_http_responses_total{{method="{method}",route="{prometheus_escape(route)}",'
+                             f'status="{status}"}} {count}')
+            lines += [
+                '# HELP sentences_sql_duration_seconds SQL statement latency by statement type.',
+                '# TYPE sentences_sql_duration_seconds histogram',
+                *self._sql.render('sentences_sql_duration_seconds', ('operation',)),
+                '# HELP sentences_sql_slow_queries_total Statements slower than the slow query threshold.',
+                '# TYPE sentences_sql_slow_queries_total counter',
+                f'sentences_sql_slow_queries_total {self._slow_queries}',
+            ]
+        for name, kind, help_text, value in extra:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """记录每条语句耗时的游标（不含之后逐行读取结果的时间）"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """cursor()/execute()/executemany() 都走 TimedCursor 的连接"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """SQLite 连接池：复用已调优的连接，避免每次请求重新打开数据库"""
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _connect(self):
+        """新建连接并设置 PRAGMA"""
+        conn = sqlite3.connect(self.path, cached_statements=SQLITE_CACHED_STATEMENTS, check_same_thread=False,
+                               factory=TimedConnection)
+        for name, value in SQLITE_PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        """取出一个空闲连接，没有则新建"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """在请求之外（后台线程、启动时）使用连接"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+db_pool = ConnectionPool(DATABASE)
+
+
+def get_db():
+    """获取当前请求使用的数据库连接，请求结束时自动归还连接池"""
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exception):
+    """请求结束时归还数据库连接"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+    conn = g.pop('read_db', None)
+    if conn is not None:
+        read_snapshot.release(conn)
+
+
+@app.before_request
+def start_request_timer():
+    """记录请求开始时间"""
+    g.request_started = time.perf_counter()
+    metrics.request_started()
+
+
+@app.after_request
+def record_response_status(response):
+    """记录响应状态码，请求结束时计入指标"""
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_request_metrics(exception):
+    """请求结束（流式响应为输出完毕）时记录耗时和状态码"""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = 500 if exception is not None else g.get('response_status', 500)
+    metrics.request_finished(request.method, route, status, time.perf_counter() - started, g.get('sql_elapsed', 0.0))
+    if request.url_rule and request.endpoint != 'static':
+        usage_counters.incr_endpoint(route)
+
+
+class RateLimiter:
+    """按 (客户端IP, 接口分组) 的令牌桶限流，桶数有上限，按最近访问顺序淘汰空闲的桶"""
+
+    def __init__(self, limits=RATE_LIMITS, max_buckets=RATE_LIMIT_MAX_BUCKETS):
+        self.limits = limits
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # (IP, 分组) -> [剩余令牌, 上次补充时间]
+        self.decisions = Counter()  # (分组, allowed/limited) -> 次数
+
+    def acquire(self, client, group):
+        """取一个令牌，返回 (是否允许, 桶容量, 剩余令牌, 桶补满还需秒数, 需等待秒数)"""
+        capacity, rate = self.limits[group]
+        key = (client, group)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            allowed = bucket[0] >= 1
+            if allowed:
+                bucket[0] -= 1
+            tokens = bucket[0]
+            self.decisions[(group, 'allowed' if allowed else 'limited')] += 1
+
+        reset = (capacity - tokens) / rate
+        retry_after = 0 if allowed else (1 - tokens) / rate
+        return allowed, capacity, int(tokens), reset, retry_after
+
+    def render(self):
+        """Prometheus 文本格式的限流计数"""
+        with self._lock:
+            decisions = sorted(self.decisions.items())
+            buckets = len(self._buckets)
+        lines = ['# HELP sentences_rate_limit_decisions_total Rate limiter decisions by route group.',
+                 '# TYPE sentences_rate_limit_decisions_total counter']
+        for (group, decision), count in decisions:
+            lines.append(f'sentences_rate_limit_decisions_total{{group="{group}",decision="{decision}"}} {count}')
+        lines += ['# HELP sentences_rate_limit_buckets Token buckets held in memory.',
+                  '# TYPE sentences_rate_limit_buckets gauge',
+                  f'sentences_rate_limit_buckets {buckets}']
+        return '\n'.join(lines) + '\n'
+
+
+rate_limiter = RateLimiter()
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+load_shed = Counter()  # 因并发已满被拒绝的请求数
+
+
+@app.before_request
+def limit_request():
+    """并发已满时返回 503；公开接口按客户端IP和分组限流，超出时返回 429"""
+    if not request_slots.acquire(blocking=False):
+        load_shed['requests'] += 1
+        response = jsonify({'error': '服务繁忙，请稍后再试'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    g.request_slot = True
+
+    group = RATE_LIMIT_GROUPS.get(request.endpoint)
+    if group is None or rate_limiter.limits.get(group) is None:
+        return None
+
+    allowed, capacity, remaining, reset, retry_after = rate_limiter.acquire(request.remote_addr, group)
+    g.rate_limit = (capacity, remaining, reset)
+    if not allowed:
+        response = jsonify({'error': '请求过于频繁，请稍后再试'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+    return None
+
+
+@app.after_request
+def add_rate_limit_headers(response):
+    """附加 RateLimit-Limit/Remaining/Reset 响应头"""
+    rate_limit = g.get('rate_limit')
+    if rate_limit is not None:
+        capacity, remaining, reset = rate_limit
+        response.headers['RateLimit-Limit'] = str(capacity)
+        response.headers['RateLimit-Remaining'] = str(remaining)
+        response.headers['RateLimit-Reset'] = str(math.ceil(reset))
+    return response
+
+
+@app.teardown_request
+def release_request_slot(exception):
+    """请求结束时释放并发名额"""
+    if g.pop('request_slot', None):
+        request_slots.release()
+
+
 # 数据库初始化
 def init_db():
-    conn = sqlite3.connect('sentences.db')
+    conn = db_pool.acquire()
     c = conn.cursor()
 
     # 创建语句表 - 添加author字段
@@ -77,6 +597,27 @@ def init_db():
         )
     ''')
 
+    # 创建全文搜索索引
+    init_search_index(c)
+
+    # 创建各状态语句数的汇总表
+    init_sentence_counts(c)
+
+    # 创建排行榜用的作者汇总表
+    init_author_stats(c)
+
+    # 创建近似重复检测用的 SimHash 索引
+    init_simhash_index(c)
+
+    # 创建供镜像同步的变更日志
+    init_change_log(c)
+
+    # 创建关键词回溯扫描的命中表和任务表
+    init_keyword_hits(c)
+
+    # 创建按小时、按接口的访问量时间序列
+    init_usage_history(c)
+
     # 插入示例数据
     c.execute("SELECT COUNT(*) FROM sentences WHERE status='approved'")
     if c.fetchone()[0] == 0:
@@ -105,69 +646,1395 @@ def init_db():
                           (item['keyword'], keyword_type, item['message']))
 
     conn.commit()
-    conn.close()
 
+    # 已有数据库的索引等结构变更由版本化迁移补齐
+    try:
+        return run_migrations(conn)
+    finally:
+        db_pool.release(conn)
+
+
+# 版本化的结构迁移：(版本号, 说明, 语句列表)，只追加不修改；已执行的版本记录在 schema_version 表中
+MIGRATIONS = (
+    (1, '管理后台按提交时间分页的索引', (
+        "CREATE INDEX IF NOT EXISTS idx_sentences_submitted ON sentences (submitted_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_sentences_status_submitted ON sentences (status, submitted_at, id)",
+    )),
+    (2, '按状态和作者筛选、排行榜重建用的索引', (
+        "CREATE INDEX IF NOT EXISTS idx_sentences_status_author ON sentences (status, author, submitted_at, id)",
+    )),
+    (3, '管理后台按作者筛选的索引', (
+        "CREATE INDEX IF NOT EXISTS idx_sentences_author_submitted ON sentences (author, submitted_at, id)",
+    )),
+    (4, '增量回溯扫描查上次成功扫描位置的索引', (
+        "CREATE INDEX IF NOT EXISTS idx_keyword_scans_status ON keyword_scans (status, max_keyword_id)",
+    )),
+    # 之前归一化后为空的内容（纯标点、空白）都写入了空串的哈希作为指纹，在查重时会全部聚成一组
+    (5, '删除归一化后为空的内容的 SimHash 指纹', (
+        "DELETE FROM sentence_simhash WHERE simhash = "
+        f"{int.from_bytes(hashlib.blake2b(b'', digest_size=8).digest(), 'big', signed=True)}",
+    )),
+)
+
+
+def run_migrations(conn):
+    """按版本号依次执行尚未执行的迁移，每个版本一个事务，可重复执行；返回本次执行的版本号列表"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
 
-def update_page_view():
-    """更新页面访问统计"""
-    today = date.today().isoformat()
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+            continue
+
+        # 多个进程同时启动时，拿到写锁之后再确认一次，避免重复执行
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            app.logger.exception('结构迁移 %d 执行失败', version)
+            raise
+        applied.append(version)
 
-    # 尝试更新或插入当天的访问统计
-    c.execute("INSERT OR IGNORE INTO page_views (view_date, view_count) VALUES (?, 0)", (today,))
-    c.execute("UPDATE page_views SET view_count = view_count + 1 WHERE view_date = ?", (today,))
+    # 新建索引之后更新统计信息，让查询规划器选用新索引
+    if applied:
+        conn.execute("PRAGMA optimize")
+    return applied
 
-    conn.commit()
-    conn.close()
 
+def schema_version(conn):
+    """当前数据库已执行到的迁移版本号"""
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
 
-def update_api_usage():
-    """更新API使用统计"""
-    today = date.today().isoformat()
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
 
-    # 尝试更新或插入当天的API使用统计
-    c.execute("INSERT OR IGNORE INTO api_usage (access_date, api_count) VALUES (?, 0)", (today,))
-    c.execute("UPDATE api_usage SET api_count = api_count + 1 WHERE access_date = ?", (today,))
+def init_search_index(c):
+    """创建全文搜索索引（FTS5 trigram 分词，支持中文子串匹配），只收录已通过的语句"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='sentences_fts'")
+    exists = c.fetchone() is not None
 
-    conn.commit()
-    conn.close()
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS sentences_fts
+        USING fts5(content, author, tokenize='trigram')
+    """)
+
+    # 通过触发器与 sentences 表保持同步
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentences_fts_insert AFTER INSERT ON sentences
+        WHEN new.status = 'approved'
+        BEGIN
+            INSERT INTO sentences_fts (rowid, content, author) VALUES (new.id, new.content, new.author);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentences_fts_delete AFTER DELETE ON sentences
+        WHEN old.status = 'approved'
+        BEGIN
+            DELETE FROM sentences_fts WHERE rowid = old.id;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentences_fts_update AFTER UPDATE OF content, author, status ON sentences
+        BEGIN
+            DELETE FROM sentences_fts WHERE rowid = old.id;
+            INSERT INTO sentences_fts (rowid, content, author)
+            SELECT new.id, new.content, new.author WHERE new.status = 'approved';
+        END
+    """)
 
+    # 已有数据库首次建立索引时补齐数据
+    if not exists:
+        rebuild_search_index(c)
+
+
+def rebuild_search_index(c):
+    """重建全文搜索索引，返回收录的语句数"""
+    c.execute("DELETE FROM sentences_fts")
+    c.execute("""
+        INSERT INTO sentences_fts (rowid, content, author)
+        SELECT id, content, author FROM sentences WHERE status = 'approved'
+    """)
+    c.execute("INSERT INTO sentences_fts (sentences_fts) VALUES ('optimize')")
+    c.execute("SELECT COUNT(*) FROM sentences_fts")
+    return c.fetchone()[0]
+
+
+def init_sentence_counts(c):
+    """创建按状态汇总的语句数表，由触发器维护，避免统计时 COUNT(*) 全表扫描"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='sentence_counts'")
+    exists = c.fetchone() is not None
+
+    # version 每次变化加一，所有行之和即整体版本号
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sentence_counts (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_counts_insert AFTER INSERT ON sentences
+        BEGIN
+            INSERT INTO sentence_counts (status, count, version) VALUES (new.status, 1, 1)
+            ON CONFLICT (status) DO UPDATE SET
+                count = count + 1, version = version + 1, updated_at = CURRENT_TIMESTAMP;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_counts_delete AFTER DELETE ON sentences
+        BEGIN
+            UPDATE sentence_counts SET
+                count = count - 1, version = version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE status = old.status;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_counts_update AFTER UPDATE OF status ON sentences
+        WHEN old.status IS NOT new.status
+        BEGIN
+            UPDATE sentence_counts SET
+                count = count - 1, version = version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE status = old.status;
+            INSERT INTO sentence_counts (status, count, version) VALUES (new.status, 1, 1)
+            ON CONFLICT (status) DO UPDATE SET
+                count = count + 1, version = version + 1, updated_at = CURRENT_TIMESTAMP;
+        END
+    """)
+
+    if not exists:
+        rebuild_sentence_counts(c)
+
+
+def rebuild_sentence_counts(c):
+    """按 sentences 表重新计算各状态语句数"""
+    c.execute("""
+        INSERT INTO sentence_counts (status, count, version)
+        SELECT status, COUNT(*), 1 FROM sentences WHERE true GROUP BY status
+        ON CONFLICT (status) DO UPDATE SET
+            count = excluded.count, version = version + 1, updated_at = CURRENT_TIMESTAMP
+    """)
+    c.execute("""
+        UPDATE sentence_counts SET count = 0, version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE count != 0 AND status NOT IN (SELECT DISTINCT status FROM sentences)
+    """)
+
+
+# 汇总表每个状态一行，整表读取
+SENTENCE_COUNTS_SQL = "SELECT status, count, version, updated_at FROM sentence_counts"
+
+
+def get_sentence_counts(c):
+    """读取汇总表，返回 ({状态: 语句数}, 版本号, 最后更新时间)"""
+    c.execute(SENTENCE_COUNTS_SQL)
+    counts = {}
+    version = 0
+    updated_at = None
+    for status, count, row_version, row_updated_at in c.fetchall():
+        counts[status] = count
+        version += row_version
+        if updated_at is None or row_updated_at > updated_at:
+            updated_at = row_updated_at
+    return counts, version, updated_at
+
+
+def init_author_stats(c):
+    """创建按作者汇总已通过语句数的表，由触发器增量维护"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='author_stats'")
+    exists = c.fetchone() is not None
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS author_stats (
+            author TEXT PRIMARY KEY,
+            approved_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_author_stats_count ON author_stats (approved_count DESC)")
+
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS author_stats_insert AFTER INSERT ON sentences
+        WHEN new.status = 'approved' AND new.author IS NOT NULL
+        BEGIN
+            INSERT INTO author_stats (author, approved_count) VALUES (new.author, 1)
+            ON CONFLICT (author) DO UPDATE SET approved_count = approved_count + 1;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS author_stats_delete AFTER DELETE ON sentences
+        WHEN old.status = 'approved'
+        BEGIN
+            UPDATE author_stats SET approved_count = approved_count - 1 WHERE author = old.author;
+            DELETE FROM author_stats WHERE author = old.author AND approved_count <= 0;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS author_stats_update AFTER UPDATE OF status, author ON sentences
+        WHEN (old.status = 'approved' OR new.status = 'approved')
+             AND (old.status IS NOT new.status OR old.author IS NOT new.author)
+        BEGIN
+            UPDATE author_stats SET approved_count = approved_count - 1
+            WHERE author = old.author AND old.status = 'approved';
+            DELETE FROM author_stats WHERE author = old.author AND approved_count <= 0;
+            INSERT INTO author_stats (author, approved_count)
+            SELECT new.author, 1 WHERE new.status = 'approved' AND new.author IS NOT NULL
+            ON CONFLICT (author) DO UPDATE SET approved_count = approved_count + 1;
+        END
+    """)
+
+    if not exists:
+        rebuild_author_stats(c)
 
-def check_duplicate(content):
-    """检查内容是否重复"""
-    content_hash = hashlib.md5(content.strip().encode('utf-8')).hexdigest()
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
 
-    c.execute("SELECT COUNT(*) FROM sentences WHERE content_hash = ?", (content_hash,))
-    count = c.fetchone()[0]
+# 按作者重新汇总已通过语句数
+AUTHOR_STATS_REBUILD_SQL = """
+    INSERT INTO author_stats (author, approved_count)
+    SELECT author, COUNT(*) FROM sentences
+    WHERE status = 'approved' AND author IS NOT NULL
+    GROUP BY author
+"""
 
-    conn.close()
-    return count > 0
+
+def rebuild_author_stats(c):
+    """按 sentences 表重新计算作者汇总表，返回作者数"""
+    c.execute("DELETE FROM author_stats")
+    c.execute(AUTHOR_STATS_REBUILD_SQL)
+    c.execute("SELECT COUNT(*) FROM author_stats")
+    return c.fetchone()[0]
+
+
+def init_simhash_index(c):
+    """创建 SimHash 指纹表，按分段建索引，用于快速查找近似重复的语句"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='sentence_simhash'")
+    exists = c.fetchone() is not None
+
+    band_columns = ', '.join(f'band{i} INTEGER NOT NULL' for i in range(SIMHASH_BANDS))
+    c.execute(f"""
+        CREATE TABLE IF NOT EXISTS sentence_simhash (
+            sentence_id INTEGER PRIMARY KEY,
+            simhash INTEGER NOT NULL,
+            {band_columns}
+        )
+    """)
+    for i in range(SIMHASH_BANDS):
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_sentence_simhash_band{i} ON sentence_simhash (band{i})")
+
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_simhash_delete AFTER DELETE ON sentences
+        BEGIN
+            DELETE FROM sentence_simhash WHERE sentence_id = old.id;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_simhash_update AFTER UPDATE OF content ON sentences
+        BEGIN
+            DELETE FROM sentence_simhash WHERE sentence_id = old.id;
+        END
+    """)
+
+    if not exists:
+        rebuild_simhash_index(c)
+
+
+def rebuild_simhash_index(c, missing_only=False):
+    """为语句计算 SimHash 指纹（missing_only 时只补齐缺失的），返回处理的语句数"""
+    if missing_only:
+        c.execute("""
+            SELECT id, content FROM sentences
+            WHERE id NOT IN (SELECT sentence_id FROM sentence_simhash)
+        """)
+    else:
+        c.execute("DELETE FROM sentence_simhash")
+        c.execute("SELECT id, content FROM sentences")
+    rows = c.fetchall()
+    for sentence_id, content in rows:
+        index_simhash(c, sentence_id, content)
+    return len(rows)
+
+
+def init_usage_history(c):
+    """创建按小时和按天的接口访问量表，主键 (接口, 时间) 支持按接口查询时间区间"""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS usage_hourly (
+            endpoint TEXT NOT NULL,
+            bucket INTEGER NOT NULL,  -- 该小时开始的 Unix 时间戳（UTC）
+            count INTEGER NOT NULL,
+            PRIMARY KEY (endpoint, bucket)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_usage_hourly_bucket ON usage_hourly (bucket)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS usage_daily (
+            endpoint TEXT NOT NULL,
+            bucket INTEGER NOT NULL,  -- 该天开始的 Unix 时间戳（UTC）
+            count INTEGER NOT NULL,
+            PRIMARY KEY (endpoint, bucket)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_usage_daily_bucket ON usage_daily (bucket)")
+
+
+# 超过保留期的小时数据按天汇总；GROUP BY 先按时间分组，规划器才会按 bucket 索引只读过期的部分，
+# 先按接口分组时会沿主键扫描整张小时表
+USAGE_ROLLUP_SQL = """
+    INSERT INTO usage_daily (endpoint, bucket, count)
+    SELECT endpoint, bucket / 86400 * 86400, SUM(count) FROM usage_hourly WHERE bucket < ?
+    GROUP BY bucket / 86400, endpoint
+    ON CONFLICT (endpoint, bucket) DO UPDATE SET count = count + excluded.count
+"""
+USAGE_PRUNE_SQL = "DELETE FROM usage_hourly WHERE bucket < ?"
+
+
+def rollup_usage_history(c, now=None):
+    """把超过保留期的小时数据汇总为按天数据并删除，返回删除的小时数据条数"""
+    now = time.time() if now is None else now
+    # 只汇总完整的天，避免同一天一部分在小时表、一部分在天表
+    cutoff = int(now - USAGE_HOURLY_RETENTION_DAYS * 86400) // 86400 * 86400
+    c.execute(USAGE_ROLLUP_SQL, (cutoff,))
+    c.execute(USAGE_PRUNE_SQL, (cutoff,))
+    return c.rowcount
+
+
+def init_keyword_hits(c):
+    """创建关键词命中表（语句ID ↔ 关键词ID）和回溯扫描任务表"""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS keyword_hits (
+            sentence_id INTEGER NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            PRIMARY KEY (sentence_id, keyword_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_keyword_hits_keyword ON keyword_hits (keyword_id)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS keyword_scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mode TEXT NOT NULL,  -- 'full' or 'incremental'
+            status TEXT NOT NULL,  -- 'running', 'done' or 'failed'
+            max_keyword_id INTEGER NOT NULL,
+            keyword_count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            scanned INTEGER DEFAULT 0,
+            hits INTEGER DEFAULT 0,
+            error TEXT,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            finished_at DATETIME
+        )
+    """)
+
+    # 语句删除或内容修改、关键词删除后，对应的命中记录随之失效
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS keyword_hits_sentence_delete AFTER DELETE ON sentences
+        BEGIN
+            DELETE FROM keyword_hits WHERE sentence_id = old.id;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS keyword_hits_sentence_update AFTER UPDATE OF content ON sentences
+        BEGIN
+            DELETE FROM keyword_hits WHERE sentence_id = old.id;
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS keyword_hits_keyword_delete AFTER DELETE ON keywords
+        BEGIN
+            DELETE FROM keyword_hits WHERE keyword_id = old.id;
+        END
+    """)
+
+
+def init_change_log(c):
+    """创建已通过语句的变更日志：seq 单调递增，每条语句只保留最新一条记录（upsert 或 delete 墓碑）"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='sentence_changes'")
+    exists = c.fetchone() is not None
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sentence_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            sentence_id INTEGER NOT NULL,
+            op TEXT NOT NULL,  -- 'upsert' or 'delete'
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sentence_changes_sentence ON sentence_changes (sentence_id)")
+
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_changes_insert AFTER INSERT ON sentences
+        WHEN new.status = 'approved'
+        BEGIN
+            INSERT INTO sentence_changes (sentence_id, op) VALUES (new.id, 'upsert');
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_changes_update AFTER UPDATE OF content, author, status ON sentences
+        WHEN new.status = 'approved' OR old.status = 'approved'
+        BEGIN
+            DELETE FROM sentence_changes WHERE sentence_id = old.id;
+            INSERT INTO sentence_changes (sentence_id, op)
+            VALUES (new.id, CASE WHEN new.status = 'approved' THEN 'upsert' ELSE 'delete' END);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS sentence_changes_delete AFTER DELETE ON sentences
+        WHEN old.status = 'approved'
+        BEGIN
+            DELETE FROM sentence_changes WHERE sentence_id = old.id;
+            INSERT INTO sentence_changes (sentence_id, op) VALUES (old.id, 'delete');
+        END
+    """)
+
+    if not exists:
+        c.execute("""
+            INSERT INTO sentence_changes (sentence_id, op)
+            SELECT id, 'upsert' FROM sentences WHERE status = 'approved' ORDER BY id
+        """)
+
+
+# 变更日志当前的位置（最大序号）
+CHANGES_MAX_SEQ_SQL = "SELECT COALESCE(MAX(seq), 0) FROM sentence_changes"
+
+
+@app.cli.command('find-duplicates')
+def find_duplicates_command():
+    """全库查重：统一内容哈希、补齐 SimHash 指纹并输出近似重复的语句组"""
+    init_db()
+    with db_pool.connection() as conn:
+        c = conn.cursor()
+
+        # 早期的插入路径对未去除首尾空白的内容计算哈希，这里统一重算
+        c.execute("SELECT id, content, content_hash FROM sentences")
+        rehashed = 0
+        for sentence_id, content, content_hash in c.fetchall():
+            expected = compute_content_hash(content)
+            if content_hash != expected:
+                c.execute("UPDATE OR IGNORE sentences SET content_hash = ? WHERE id = ?", (expected, sentence_id))
+                rehashed += c.rowcount
+
+        indexed = rebuild_simhash_index(c, missing_only=True)
+        conn.commit()
+
+        clusters = find_duplicate_clusters(c)
+        for members in clusters:
+            placeholders = ','.join('?' * len(members))
+            c.execute(f"SELECT id, status, content FROM sentences WHERE id IN ({placeholders}) ORDER BY id", members)
+            print('-' * 40)
+            for sentence_id, status, content in c.fetchall():
+                print(f'#{sentence_id} [{status}] {content[:60]!r}')
+
+    print(f'重算内容哈希 {rehashed} 条，补齐指纹 {indexed} 条，共 {len(clusters)} 组近似重复')
+
+
+@app.cli.command('rescan-keywords')
+@click.option('--incremental', is_flag=True, help='只扫描上次扫描之后新增的关键词')
+def rescan_keywords_command(incremental):
+    """用关键词回溯扫描全部语句，命中记录写入 keyword_hits"""
+    init_db()
+    scan_id = keyword_rescan.run('incremental' if incremental else 'full')
+    with db_pool.connection() as conn:
+        status, scanned, hits, error = conn.execute(
+            "SELECT status, scanned, hits, error FROM keyword_scans WHERE id = ?", (scan_id,)).fetchone()
+    if status == 'done':
+        print(f'扫描完成，共扫描 {scanned} 条语句，命中 {hits} 次')
+    else:
+        print(f'扫描失败: {error}')
+
+
+@app.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    """重建排行榜汇总数据（批量修改数据库之后使用）"""
+    init_db()
+    with db_pool.connection() as conn:
+        count = rebuild_author_stats(conn.cursor())
+        rebuild_sentence_counts(conn.cursor())
+        conn.commit()
+    print(f'排行榜数据已重建，共 {count} 位作者')
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """重建全文搜索索引（用于已有数据库或直接修改数据库之后）"""
+    init_db()
+    with db_pool.connection() as conn:
+        count = rebuild_search_index(conn.cursor())
+        conn.commit()
+    print(f'搜索索引已重建，共 {count} 条语句')
+
+
+@app.cli.command('migrate')
+def migrate_command():
+    """执行尚未执行的结构迁移（启动时也会自动执行）"""
+    applied = init_db()
+    with db_pool.connection() as conn:
+        version = schema_version(conn)
+    if applied:
+        print(f'已执行迁移 {", ".join(map(str, applied))}，当前版本 {version}')
+    else:
+        print(f'没有需要执行的迁移，当前版本 {version}')
+
+
+# 管理后台语句列表的筛选组合：(说明, admin_sentences_query 的参数, 应使用的索引之一)
+ADMIN_LISTING_PLAN_CHECKS = (
+    ('管理后台全部语句', (), ('idx_sentences_submitted',)),
+    ('管理后台按状态筛选', ('pending',), ('idx_sentences_status_submitted',)),
+    ('管理后台按作者筛选', ('all', '', '匿名'), ('idx_sentences_author_submitted',)),
+    ('管理后台按状态和作者筛选', ('pending', '', '匿名'), ('idx_sentences_status_author',)),
+    ('管理后台翻页', ('all', '', '', ['', 0]), ('idx_sentences_submitted',)),
+    ('管理后台按状态筛选翻页', ('pending', '', '', ['', 0]), ('idx_sentences_status_submitted',)),
+    ('管理后台按作者筛选翻页', ('all', '', '匿名', ['', 0]), ('idx_sentences_author_submitted',)),
+    ('管理后台按内容筛选', ('all', '测试'), ('idx_sentences_submitted',)),
+    ('管理后台按状态、内容和作者筛选', ('pending', '测试', '匿名'), ('idx_sentences_status_author',)),
+)
+
+
+def query_plan_checks():
+    """需要检查查询计划的全部查询：(说明, SQL, 参数, 查询计划中应出现的索引名之一)。
+    SQL 取自各接口实际使用的常量和构造函数；只写入一行的 INSERT 没有查询计划，不在其中。
+    有意读取整张表的查询（导出、关键词表等小表），把对应的 SCAN 步骤写在预期中"""
+    ids = (1, 2, 3, 4, 5)
+    status_indexes = ('idx_sentences_status_submitted', 'idx_sentences_status_author')
+    checks = [
+        ('随机语句按ID取内容', approved_by_ids_sql(len(ids)), ids, ('INTEGER PRIMARY KEY',)),
+        ('随机语句ID池加载', ApprovedPool.LOAD_SQL, (), status_indexes),
+        ('随机语句ID池同步', ApprovedPool.SYNC_SQL, (0,), ('INTEGER PRIMARY KEY',)),
+        ('变更日志位置', CHANGES_MAX_SEQ_SQL, (), ('SEARCH sentence_changes',)),
+        ('变更订阅', CHANGES_SQL, (0, CHANGES_MAX_LIMIT + 1), ('INTEGER PRIMARY KEY',)),
+        ('导出', EXPORT_SQL, (), ('SCAN sentences',)),
+        ('各状态语句数', SENTENCE_COUNTS_SQL, (), ('SCAN sentence_counts',)),
+        ('待审核语句数', PENDING_COUNT_SQL, (), status_indexes),
+        ('一键通过', APPROVE_ALL_SQL, ('',), status_indexes),
+        ('内容哈希查重', CONTENT_HASH_ID_SQL, ('',), ('sqlite_autoindex_sentences_1',)),
+        ('导入批量查重', content_hashes_sql(len(ids)), ('',) * len(ids), ('sqlite_autoindex_sentences_1',)),
+        ('近似重复检测', SIMILAR_SENTENCES_SQL, (0,) * SIMHASH_BANDS, ('idx_sentence_simhash_band0',)),
+        ('管理后台近似重复标记', similar_ids_sql(len(ids)), ids * SIMHASH_BANDS, ('idx_sentence_simhash_band0',)),
+        ('按ID取语句', SENTENCE_BY_ID_SQL, (0,), ('INTEGER PRIMARY KEY',)),
+        ('按ID取完整语句', sentences_by_ids_sql(len(ids)), ids, ('INTEGER PRIMARY KEY',)),
+        ('审核语句', MODERATE_SQL, ('approved', '', 0), ('INTEGER PRIMARY KEY',)),
+        ('删除语句', DELETE_SENTENCE_SQL, (0,), ('INTEGER PRIMARY KEY',)),
+        ('排行榜', LEADERBOARD_TOP_SQL, LEADERBOARD_EXCLUDED_AUTHORS + (LEADERBOARD_MAX_LIMIT,),
+         ('idx_author_stats_count',)),
+        ('排行榜作者总数', LEADERBOARD_AUTHORS_SQL, LEADERBOARD_EXCLUDED_AUTHORS,
+         ('sqlite_autoindex_author_stats_1', 'idx_author_stats_count')),
+        ('排行榜重建', AUTHOR_STATS_REBUILD_SQL, (), ('idx_sentences_status_author',)),
+        ('今日访问量', UsageCounters.total_sql('page_views'), ('',), ('sqlite_autoindex_page_views_1',)),
+        ('今日API调用次数', UsageCounters.total_sql('api_usage'), ('',), ('sqlite_autoindex_api_usage_1',)),
+        ('访问量写入', UsageCounters.increment_sql('page_views'), (1, ''), ('sqlite_autoindex_page_views_1',)),
+        ('API调用次数写入', UsageCounters.increment_sql('api_usage'), (1, ''), ('sqlite_autoindex_api_usage_1',)),
+        ('访问量按天汇总', USAGE_ROLLUP_SQL, (0,), ('idx_usage_hourly_bucket',)),
+        ('删除已汇总的小时数据', USAGE_PRUNE_SQL, (0,), ('idx_usage_hourly_bucket',)),
+        ('关键词自动机加载', KEYWORD_ENTRIES_SQL, (), ('SCAN keywords',)),
+        ('关键词列表', KEYWORD_LIST_SQL, (), ('SCAN keywords',)),
+        ('删除关键词', DELETE_KEYWORD_SQL, (0,), ('INTEGER PRIMARY KEY',)),
+        ('最近一次回溯扫描', KEYWORD_SCAN_LATEST_SQL, (), ('INTEGER PRIMARY KEY',)),
+        ('关键词命中列表', KEYWORD_HIT_IDS_SQL, (2 ** 63 - 1, ADMIN_PAGE_SIZE + 1), ('PRIMARY KEY',)),
+        ('关键词命中详情', keyword_hits_sql(len(ids)), ids, ('PRIMARY KEY',)),
+        ('回溯扫描起点', KeywordRescan.SCANNED_KEYWORD_SQL, (), ('idx_keyword_scans_status',)),
+        ('回溯扫描的关键词', KeywordRescan.KEYWORDS_SQL, (0,), ('INTEGER PRIMARY KEY',)),
+        ('回溯扫描的语句数', KeywordRescan.TOTAL_SQL, (), ('COVERING INDEX',)),
+        ('最大关键词ID', KeywordRescan.MAX_KEYWORD_SQL, (), ('SEARCH keywords',)),
+        ('回溯扫描分块读取', KeywordRescan.CHUNK_SQL, (0, RESCAN_CHUNK_SIZE), ('INTEGER PRIMARY KEY',)),
+        ('回溯扫描进度', KeywordRescan.PROGRESS_SQL, (0, 0, 0), ('INTEGER PRIMARY KEY',)),
+        ('回溯扫描结束', KeywordRescan.FINISH_SQL, ('done', None, 0), ('INTEGER PRIMARY KEY',)),
+        # 有意整表读取临时表中的命中记录，逐条按主键确认语句和关键词仍存在
+        ('回溯扫描结果并入', KeywordRescan.MERGE_SQL, (), ('SCAN h',)),
+    ]
+    checks.append(('近似重复分组分页', DUPLICATE_SCAN_SQL, (0, DUPLICATE_SCAN_SIZE), ('INTEGER PRIMARY KEY',)))
+    for band in range(SIMHASH_BANDS):
+        checks.append((f'全库近似重复聚类（分段{band}）', duplicate_band_sql(band), (),
+                       (f'idx_sentence_simhash_band{band}',)))
+    for resolution in ('hour', 'day'):
+        for endpoint in (None, 'random'):
+            params = ((endpoint,) if endpoint is not None else ()) + (0, 0)
+            for sql in UsageCounters.history_queries(endpoint, resolution):
+                table = 'usage_daily' if 'FROM usage_daily' in sql else 'usage_hourly'
+                expected = ('PRIMARY KEY',) if endpoint is not None else (f'idx_{table}_bucket',)
+                scope = '单个接口' if endpoint is not None else '全部接口'
+                checks.append((f'访问量历史（按{"小时" if resolution == "hour" else "天"}，{table}，{scope}）',
+                               sql, params, expected))
+    # 搜索在全文索引虚拟表上执行，检查 MATCH 和短关键词子串匹配下按作者筛选、翻页的各种组合
+    for keyword in ('哈基米', '哈'):
+        for author in ('', '匿名'):
+            for cursor in (None, [0, 0]):
+                sql, params = search_query(keyword, author, cursor)
+                name = (f'{"搜索" if len(keyword) >= 3 else "短关键词搜索"}'
+                        f'{"按作者筛选" if author else ""}{"翻页" if cursor else ""}')
+                checks.append((name, sql + " LIMIT ?", tuple(params) + (SEARCH_PAGE_SIZE + 1,), ('VIRTUAL TABLE',)))
+    for name, args, expected in ADMIN_LISTING_PLAN_CHECKS:
+        sql, params = admin_sentences_query(*args)
+        checks.append((name, sql + " LIMIT ?", tuple(params) + (ADMIN_PAGE_SIZE + 1,), expected))
+    return checks
+
+
+def explain_query_plan(conn, sql, params):
+    """EXPLAIN QUERY PLAN 的每一步说明"""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def query_plan_problems(plan, expected):
+    """检查查询计划：不允许不走索引的全表扫描（虚拟表和预期中列出的除外），并且要用到预期的索引之一"""
+    problems = [f'全表扫描: {step}' for step in plan
+                if step.startswith('SCAN ') and ' USING ' not in step and 'VIRTUAL TABLE' not in step
+                and step not in expected]
+    if not any(name in step for step in plan for name in expected):
+        problems.append(f'未使用索引 {" / ".join(expected)}')
+    return problems
+
+
+def run_query_plan_checks(conn):
+    """在给定连接上检查全部查询的查询计划，返回 [(说明, 查询计划, 问题列表), ...]"""
+    # 回溯扫描把命中记录暂存在连接上的临时表中，检查并入语句之前先建好
+    conn.execute(KeywordRescan.STAGING_TABLE_SQL)
+    try:
+        results = []
+        for name, sql, params, expected in query_plan_checks():
+            plan = explain_query_plan(conn, sql, params)
+            results.append((name, plan, query_plan_problems(plan, expected)))
+        return results
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.keyword_scan_hits")
+
+
+@app.cli.command('check-query-plans')
+@click.option('--verbose', '-v', is_flag=True, help='输出每个查询的完整查询计划')
+def check_query_plans_command(verbose):
+    """用 EXPLAIN QUERY PLAN 检查各接口执行的查询都走索引，发现全表扫描时以非零状态退出"""
+    init_db()
+    failed = 0
+    with db_pool.connection() as conn:
+        results = run_query_plan_checks(conn)
+    for name, plan, problems in results:
+        print(f'{"FAIL" if problems else "ok  "} {name}')
+        for line in (plan if verbose or problems else []):
+            print(f'       {line}')
+        for problem in problems:
+            print(f'     ! {problem}')
+        failed += bool(problems)
+
+    if failed:
+        raise click.ClickException(f'{failed} 个查询的查询计划不符合预期')
+    print(f'全部 {len(results)} 个查询均使用了索引')
+
+
+class SharedCounters:
+    """一组放在共享内存中的整数，fork 出的工作进程看到同一份数值（须在 fork 前创建）"""
+
+    def __init__(self, names):
+        self.names = names
+        self.lock = multiprocessing.RLock()
+        self._values = multiprocessing.RawArray('q', len(names))
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self._values[self.names.index(name)] += amount
+
+    def set(self, name, value):
+        with self.lock:
+            self._values[self.names.index(name)] = value
+
+    def get(self, name):
+        with self.lock:
+            return self._values[self.names.index(name)]
+
+
+class UsageCounters:
+    """访问量/API调用次数的写回缓冲：内存中累加，由后台线程定时或在达到阈值时在一个事务内批量写入。
+    当天尚未写入的计数另在共享内存中合计，多进程部署时 /api/stats 能看到所有进程的增量"""
+
+    # 计数类型 -> (表名, 日期列, 计数列)
+    TABLES = {
+        'page_views': ('page_views', 'view_date', 'view_count'),
+        'api_usage': ('api_usage', 'access_date', 'api_count'),
+    }
+
+    def __init__(self, interval=COUNTER_FLUSH_INTERVAL, threshold=COUNTER_FLUSH_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # 每种计数两项：日期序号、所有进程当天尚未写入数据库的增量
+        self._unflushed_today = SharedCounters(tuple(f'{kind}:{field}' for kind in self.TABLES
+                                                     for field in ('day', 'count')))
+        self._pending = {}  # (计数类型, 日期) -> 未写入的增量
+        self._flushing = {}  # 正在写入数据库的增量，写入完成前仍计入统计
+        self._hourly = {}  # (接口, 小时) -> 未写入的增量
+        self._hourly_flushing = {}
+        self._pending_total = 0
+        self._last_rollup = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def incr(self, kind, amount=1):
+        """累加一次计数"""
+        today = date.today()
+        shared = self._unflushed_today
+        with shared.lock:
+            if shared.get(f'{kind}:day') != today.toordinal():
+                # 新的一天：之前的增量属于前一天，不再计入
+                shared.set(f'{kind}:day', today.toordinal())
+                shared.set(f'{kind}:count', 0)
+            shared.add(f'{kind}:count', amount)
+        self._add(self._pending, (kind, today.isoformat()), amount)
+
+    def incr_endpoint(self, endpoint, amount=1):
+        """累加一次接口访问，按小时分桶"""
+        self._add(self._hourly, (endpoint, int(time.time()) // 3600 * 3600), amount)
+
+    def _add(self, pending, key, amount):
+        with self._lock:
+            pending[key] = pending.get(key, 0) + amount
+            self._pending_total += amount
+            if self._thread is None:
+                self._start()
+            due = self._pending_total >= self.threshold
+
+        # 写入由后台线程完成，请求线程只负责在积压过多时提前唤醒它
+        if due:
+            self._wakeup.set()
+
+    def unflushed(self, kind, day):
+        """尚未写入数据库的增量：当天的为所有进程的合计，其他日期只有本进程的"""
+        shared = self._unflushed_today
+        with shared.lock:
+            if shared.get(f'{kind}:day') == date.fromisoformat(day).toordinal():
+                return shared.get(f'{kind}:count')
+        key = (kind, day)
+        with self._lock:
+            return self._pending.get(key, 0) + self._flushing.get(key, 0)
+
+    @classmethod
+    def total_sql(cls, kind):
+        """读取某天计数的 SQL，参数为日期"""
+        table, date_column, count_column = cls.TABLES[kind]
+        return f"SELECT {count_column} FROM {table} WHERE {date_column} = ?"
+
+    @classmethod
+    def increment_sql(cls, kind):
+        """累加某天计数的 SQL，参数为 (增量, 日期)"""
+        table, date_column, count_column = cls.TABLES[kind]
+        return f"UPDATE {table} SET {count_column} = {count_column} + ? WHERE {date_column} = ?"
+
+    @staticmethod
+    def history_queries(endpoint, resolution):
+        """访问量时间序列的 SQL 列表，参数为 ([接口,] 开始, 结束)；按天查询时包含已汇总的天数据"""
+        width = 3600 if resolution == 'hour' else 86400
+        endpoint_filter = 'endpoint = ? AND' if endpoint is not None else ''
+        queries = [f"SELECT bucket / {width} * {width}, SUM(count) FROM usage_hourly "
+                   f"WHERE {endpoint_filter} bucket >= ? AND bucket < ? GROUP BY 1"]
+        if resolution == 'day':
+            queries.append(f"SELECT bucket, SUM(count) FROM usage_daily "
+                           f"WHERE {endpoint_filter} bucket >= ? AND bucket < ? GROUP BY 1")
+        return queries
+
+    def total(self, cursor, kind, day):
+        """数据库中的计数加上未写入的增量；与写入互斥，保证结果准确"""
+        with self._flush_lock:
+            cursor.execute(self.total_sql(kind), (day,))
+            result = cursor.fetchone()
+            return (result[0] if result else 0) + self.unflushed(kind, day)
+
+    def history(self, cursor, endpoint, start, end, resolution):
+        """接口访问量时间序列 [(时间桶, 次数), ...]，包含尚未写入的增量；endpoint 为 None 时合计全部接口"""
+        width = 3600 if resolution == 'hour' else 86400
+        params = ((endpoint,) if endpoint is not None else ()) + (start, end)
+
+        # 按天查询时，已汇总的天数据加上仍在小时表中的数据
+        points = Counter()
+        with self._flush_lock:
+            for query in self.history_queries(endpoint, resolution):
+                cursor.execute(query, params)
+                for bucket, count in cursor.fetchall():
+                    points[bucket] += count
+            with self._lock:
+                for pending in (self._hourly, self._hourly_flushing):
+                    for (name, bucket), count in pending.items():
+                        if (endpoint is None or name == endpoint) and start <= bucket < end:
+                            points[bucket // width * width] += count
+        return sorted(points.items())
+
+    def flush(self):
+        """把缓冲的增量在一个事务内写入数据库"""
+        with self._flush_lock:
+            with self._lock:
+                rollup_due = time.monotonic() - self._last_rollup >= 3600
+                if not self._pending and not self._hourly and not rollup_due:
+                    return
+                self._flushing, self._hourly_flushing = self._pending, self._hourly
+                self._pending, self._hourly = {}, {}
+                self._pending_total = 0
+
+            batch, hourly = self._flushing, self._hourly_flushing
+            # 先从共享合计中扣除再提交：其他进程在提交完成前读到的合计略少，而不会重复计算
+            self._settle_today(batch, -1)
+            try:
+                with db_pool.connection() as conn, conn:
+                    for (kind, day), delta in batch.items():
+                        table, date_column, count_column = self.TABLES[kind]
+                        conn.execute(f"INSERT OR IGNORE INTO {table} ({date_column}, {count_column}) VALUES (?, 0)",
+                                     (day,))
+                        conn.execute(self.increment_sql(kind), (delta, day))
+                    conn.executemany("""
+                        INSERT INTO usage_hourly (endpoint, bucket, count) VALUES (?, ?, ?)
+                        ON CONFLICT (endpoint, bucket) DO UPDATE SET count = count + excluded.count
+                    """, [(endpoint, bucket, delta) for (endpoint, bucket), delta in hourly.items()])
+                    if rollup_due:
+                        rollup_usage_history(conn.cursor())
+                if rollup_due:
+                    self._last_rollup = time.monotonic()
+            except sqlite3.Error as e:
+                # 写入失败则放回缓冲，等下次再写
+                app.logger.warning('写入访问统计失败: %s', e)
+                self._settle_today(batch, 1)
+                with self._lock:
+                    for pending, flushed in ((self._pending, batch), (self._hourly, hourly)):
+                        for key, delta in flushed.items():
+                            pending[key] = pending.get(key, 0) + delta
+                            self._pending_total += delta
+            finally:
+                with self._lock:
+                    self._flushing, self._hourly_flushing = {}, {}
+
+    def _settle_today(self, batch, sign):
+        """把一批增量中当天的部分按 sign 计入共享的未写入合计"""
+        shared = self._unflushed_today
+        with shared.lock:
+            for (kind, day), delta in batch.items():
+                if shared.get(f'{kind}:day') == date.fromisoformat(day).toordinal():
+                    shared.add(f'{kind}:count', sign * delta)
+
+    def _start(self):
+        """启动后台定时写入线程（调用方需持有锁）"""
+        self._thread = threading.Thread(target=self._run, name='usage-counters', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """停止后台线程并写入剩余计数"""
+        self._stop.set()
+        self._wakeup.set()
+        self.flush()
+
+
+usage_counters = UsageCounters()
+atexit.register(usage_counters.close)
+
+
+def update_page_view():
+    """更新页面访问统计"""
+    usage_counters.incr('page_views')
+
+
+def update_api_usage():
+    """更新API使用统计"""
+    usage_counters.incr('api_usage')
+
+
+# 按内容哈希查重（唯一索引），返回已有语句的ID
+CONTENT_HASH_ID_SQL = "SELECT id FROM sentences WHERE content_hash = ? LIMIT 1"
+
+
+class SubmissionQueue:
+    """用户投稿的持久化队列：请求只做简单校验后写入独立的队列库立即返回，
+    后台线程批量查重、检查关键词并写入主库。先提交主库再删除队列记录，
+    中途退出时重放的记录会被查重拦下，不会重复入库。未入库的投稿连同原因移入 rejected_submissions 表"""
+
+    RESULTS = ('accepted', 'duplicate', 'blocked', 'failed')
+
+    def __init__(self, path=SUBMISSION_QUEUE_DB, interval=SUBMISSION_DRAIN_INTERVAL, batch_size=SUBMISSION_BATCH_SIZE,
+                 max_attempts=SUBMISSION_MAX_ATTEMPTS):
+        self.path = path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._attempts = {}  # 队列记录ID -> 连续处理失败次数
+        self._conn = None
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # 多进程部署时只由一个工作进程在后台处理队列，其余进程只写入；处理结果计数放在共享内存中，各进程都能读到
+        self.background = True
+        self.stats = SharedCounters(self.RESULTS + ('last_drain_at',))
+
+    def _connection(self):
+        """队列库连接（调用方需持有锁）"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS rejected_submissions (
+                    id INTEGER PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    rejected_at REAL NOT NULL,
+                    result TEXT NOT NULL,
+                    detail TEXT
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def put(self, content, author):
+        """写入一条投稿并唤醒后台线程"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT INTO submissions (content, author, enqueued_at) VALUES (?, ?, ?)",
+                         (content, author, time.time()))
+            conn.commit()
+            if self._thread is None and self.background:
+                self._start()
+        self._wakeup.set()
+
+    def status(self):
+        """队列长度、最早一条投稿的等待时间（秒）和处理结果计数"""
+        with self._lock:
+            depth, oldest = self._connection().execute(
+                "SELECT COUNT(*), MIN(enqueued_at) FROM submissions").fetchone()
+        last_drain_at = self.stats.get('last_drain_at')
+        if last_drain_at:
+            last_drain_at = datetime.fromtimestamp(last_drain_at).isoformat(timespec='seconds')
+        return {
+            'depth': depth,
+            'lag_seconds': round(time.time() - oldest, 3) if oldest else 0,
+            **{result: self.stats.get(result) for result in self.RESULTS},
+            'last_drain_at': last_drain_at or None
+        }
+
+    def drain(self):
+        """处理队列中的全部投稿，返回处理条数"""
+        total = 0
+        with self._drain_lock:
+            while True:
+                with self._lock:
+                    batch = self._connection().execute(
+                        "SELECT id, content, author, enqueued_at FROM submissions ORDER BY id LIMIT ?",
+                        (self.batch_size,)).fetchall()
+                if not batch:
+                    break
+
+                try:
+                    results = self._process(batch)
+                except sqlite3.Error as e:
+                    # 整批写入失败时逐条重试，个别无法处理的记录不会挡住后面的投稿
+                    app.logger.warning('处理投稿队列失败，逐条重试: %s', e)
+                    results = self._process_each(batch)
+
+                done = [(row, outcome) for row, outcome in zip(batch, results) if outcome is not None]
+                now = time.time()
+                with self._lock:
+                    conn = self._connection()
+                    # 先记下未入库的原因再删除队列记录
+                    conn.executemany("""
+                        INSERT OR REPLACE INTO rejected_submissions
+                            (id, content, author, enqueued_at, rejected_at, result, detail)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, [row + (now,) + outcome for row, outcome in done if outcome[0] != 'accepted'])
+                    conn.executemany("DELETE FROM submissions WHERE id = ?", [(row[0],) for row, _ in done])
+                    conn.commit()
+                for row, (result, detail) in done:
+                    self.stats.add(result)
+                    self._attempts.pop(row[0], None)
+                    if result != 'accepted':
+                        log = app.logger.warning if result == 'failed' else app.logger.info
+                        log('投稿 #%d 未入库（%s）: %s', row[0], result, detail)
+                total += len(done)
+
+                if len(done) < len(batch):
+                    # 还有处理失败的记录，等下次再重试
+                    break
+
+            self.stats.set('last_drain_at', int(time.time()))
+        return total
+
+    def _process(self, batch):
+        """在一个事务内查重、检查关键词并写入待审核语句，返回每条的 (处理结果, 说明)"""
+        results = []
+        with db_pool.connection() as conn, conn:
+            c = conn.cursor()
+            for _, content, author, _ in batch:
+                content_hash = compute_content_hash(content)
+                row = c.execute(CONTENT_HASH_ID_SQL, (content_hash,)).fetchone()
+                if row:
+                    results.append(('duplicate', f'与语句 #{row[0]} 重复'))
+                    continue
+
+                fingerprint = compute_simhash(content)
+                similar = find_similar_sentences(c, fingerprint)
+                if similar:
+                    results.append(('duplicate', f'与语句 #{similar[0][0]} 近似重复'))
+                    continue
+
+                # 入队后关键词可能有变化，入库前再检查一次
+                checked = check_keywords(content)
+                if checked['has_errors']:
+                    results.append(('blocked', '包含禁止关键词: ' + ', '.join(e['keyword'] for e in checked['errors'])))
+                    continue
+
+                c.execute("INSERT INTO sentences (content, author, status, content_hash) VALUES (?, ?, 'pending', ?)",
+                          (content, author, content_hash))
+                index_simhash(c, c.lastrowid, content, fingerprint)
+                results.append(('accepted', None))
+
+        if ('accepted', None) in results:
+            data_version.bump('sentences')
+        return results
+
+    def _process_each(self, batch):
+        """逐条处理，返回每条的 (处理结果, 说明)；仍然失败的记录为 None，
+        连续失败 max_attempts 次的记录作为 failed 移出队列"""
+        results = []
+        for row in batch:
+            try:
+                results.extend(self._process([row]))
+            except sqlite3.Error as e:
+                attempts = self._attempts[row[0]] = self._attempts.get(row[0], 0) + 1
+                app.logger.warning('投稿 #%d 第 %d 次处理失败: %s', row[0], attempts, e)
+                results.append(('failed', f'处理失败 {attempts} 次: {e}') if attempts >= self.max_attempts else None)
+        return results
+
+    def start(self):
+        """启动后台处理线程（处理启动前已在队列中的投稿）；不负责处理队列的进程什么也不做"""
+        if self._thread is not None or not self.background:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        """启动后台处理线程（调用方需持有锁）"""
+        self._thread = threading.Thread(target=self._run, name='submission-queue', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.drain()
+
+    def close(self):
+        """停止后台线程并处理剩余投稿"""
+        self._stop.set()
+        self._wakeup.set()
+        if self.background and (self._conn is not None or os.path.exists(self.path)):
+            self.drain()
+
+
+submission_queue = SubmissionQueue()
+atexit.register(submission_queue.close)
+
+
+@app.before_request
+def start_submission_queue():
+    """收到第一个请求时启动投稿队列的后台线程，上次退出时遗留的投稿不必等新投稿到来才处理"""
+    submission_queue.start()
+
+
+def compute_content_hash(content):
+    """计算用于查重的内容哈希"""
+    return hashlib.md5(content.strip().encode('utf-8')).hexdigest()
+
+
+def normalize_content(content):
+    """归一化内容：全半角统一、转小写，去掉空白、标点和控制字符"""
+    text = unicodedata.normalize('NFKC', content).lower()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in 'PZC')
+
+
+def compute_simhash(content):
+    """基于字符三元组计算64位 SimHash 指纹；归一化后为空（纯标点、空白）的内容没有指纹，返回 None"""
+    text = normalize_content(content)
+    if not text:
+        return None
+    shingles = Counter(text[i:i + 3] for i in range(len(text) - 2)) or Counter([text])
+
+    weights = [0] * 64
+    for shingle, weight in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += weight
+            else:
+                weights[bit] -= weight
+
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def simhash_bands(fingerprint):
+    """把指纹切成 SIMHASH_BANDS 段；汉明距离不超过 SIMHASH_BANDS - 1 的两个指纹至少有一段完全相同"""
+    width = 64 // SIMHASH_BANDS
+    return [fingerprint >> (width * i) & ((1 << width) - 1) for i in range(SIMHASH_BANDS)]
+
+
+def to_signed64(value):
+    """SQLite INTEGER 是有符号64位整数"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def index_simhash(c, sentence_id, content, fingerprint=None):
+    """写入语句的 SimHash 指纹（没有指纹的内容不写入）"""
+    if fingerprint is None:
+        fingerprint = compute_simhash(content)
+    if fingerprint is None:
+        c.execute("DELETE FROM sentence_simhash WHERE sentence_id = ?", (sentence_id,))
+        return
+    band_columns = ', '.join(f'band{i}' for i in range(SIMHASH_BANDS))
+    placeholders = ', '.join('?' * (SIMHASH_BANDS + 2))
+    c.execute(f"INSERT OR REPLACE INTO sentence_simhash (sentence_id, simhash, {band_columns}) VALUES ({placeholders})",
+              [sentence_id, to_signed64(fingerprint)] + simhash_bands(fingerprint))
+
+
+# 任一分段取值相同的语句作为近似重复候选，参数为各分段的取值
+SIMILAR_SENTENCES_SQL = ' UNION '.join(f"SELECT sentence_id, simhash FROM sentence_simhash WHERE band{i} = ?"
+                                       for i in range(SIMHASH_BANDS))
+
+
+def find_similar_sentences(c, fingerprint, exclude_id=None):
+    """查找与指纹近似的语句，返回 [(语句ID, 汉明距离), ...]，按距离排序"""
+    if fingerprint is None:
+        return []
+    c.execute(SIMILAR_SENTENCES_SQL, simhash_bands(fingerprint))
+
+    similar = []
+    for sentence_id, other in c.fetchall():
+        if sentence_id == exclude_id:
+            continue
+        distance = bin(fingerprint ^ (other & 0xFFFFFFFFFFFFFFFF)).count('1')
+        if distance <= NEAR_DUPLICATE_DISTANCE:
+            similar.append((sentence_id, distance))
+    similar.sort(key=lambda item: item[1])
+    return similar
+
+
+def similar_ids_sql(count):
+    """批量查找近似重复候选的 SQL，参数为 count 个语句ID重复 SIMHASH_BANDS 遍"""
+    placeholders = ','.join('?' * count)
+    return ' UNION '.join(f"""
+        SELECT a.sentence_id, a.simhash, b.sentence_id, b.simhash
+        FROM sentence_simhash a JOIN sentence_simhash b ON b.band{i} = a.band{i}
+        WHERE a.sentence_id IN ({placeholders}) AND b.sentence_id != a.sentence_id
+    """ for i in range(SIMHASH_BANDS))
+
+
+def find_similar_ids(c, sentence_ids):
+    """批量查找一组语句各自的近似重复语句，返回 {语句ID: [相似语句ID, ...]}"""
+    result = {sentence_id: [] for sentence_id in sentence_ids}
+    if not sentence_ids:
+        return result
+
+    c.execute(similar_ids_sql(len(sentence_ids)), list(sentence_ids) * SIMHASH_BANDS)
+
+    for sentence_id, fingerprint, other_id, other in c.fetchall():
+        if bin((fingerprint ^ other) & 0xFFFFFFFFFFFFFFFF).count('1') <= NEAR_DUPLICATE_DISTANCE:
+            result[sentence_id].append(other_id)
+    for similar in result.values():
+        similar.sort()
+    return result
+
+
+def duplicate_band_sql(band):
+    """某一分段取值出现多次的全部指纹，按该分段排序"""
+    return f"""
+        SELECT band{band}, sentence_id, simhash FROM sentence_simhash
+        WHERE band{band} IN (SELECT band{band} FROM sentence_simhash GROUP BY band{band} HAVING COUNT(*) > 1)
+        ORDER BY band{band}
+    """
+
+
+def find_duplicate_clusters(c):
+    """全库近似重复聚类：某一分段取值相同的语句作为候选，再按汉明距离合并，返回 [[语句ID, ...], ...]"""
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    for i in range(SIMHASH_BANDS):
+        c.execute(duplicate_band_sql(i))
+        groups = {}
+        for band, sentence_id, fingerprint in c.fetchall():
+            groups.setdefault(band, []).append((sentence_id, fingerprint))
+
+        for group in groups.values():
+            for a in range(len(group)):
+                for b in range(a + 1, len(group)):
+                    distance = bin((group[a][1] ^ group[b][1]) & 0xFFFFFFFFFFFFFFFF).count('1')
+                    if distance <= NEAR_DUPLICATE_DISTANCE:
+                        union(group[a][0], group[b][0])
+
+    clusters = {}
+    for sentence_id in parent:
+        clusters.setdefault(find(sentence_id), []).append(sentence_id)
+    return sorted(sorted(members) for members in clusters.values())
+
+
+# 按语句ID顺序分页读取指纹，参数为 (上一页最后的语句ID, 条数)
+DUPLICATE_SCAN_SQL = "SELECT sentence_id FROM sentence_simhash WHERE sentence_id > ? ORDER BY sentence_id LIMIT ?"
+
+
+def expand_duplicate_cluster(c, sentence_id, similar, max_size=DUPLICATE_CLUSTER_MAX_SIZE):
+    """从一条语句和它的近似重复语句出发，沿近似重复关系逐层展开所在的组（最多 max_size 条），返回排好序的语句ID"""
+    members = {sentence_id, *similar}
+    frontier = set(similar)
+    while frontier and len(members) < max_size:
+        found = find_similar_ids(c, sorted(frontier))
+        frontier = {other for ids in found.values() for other in ids} - members
+        members |= frontier
+    return sorted(members)[:max_size]
+
+
+def find_duplicate_clusters_page(c, after_id=0, limit=100, scan_size=DUPLICATE_SCAN_SIZE):
+    """从 after_id 之后按语句ID扫描最多 scan_size 条指纹，返回 (组内最小ID落在本页的近似重复组, 下一页游标)。
+    每页只查本页语句的近似重复候选，有候选的才展开整组，请求的开销与全库语句数无关"""
+    c.execute(DUPLICATE_SCAN_SQL, (after_id, scan_size))
+    ids = [row[0] for row in c.fetchall()]
+    similar = find_similar_ids(c, ids)
+
+    clusters = []
+    seen = set()
+    for index, sentence_id in enumerate(ids):
+        if len(clusters) >= limit:
+            return clusters, ids[index - 1]
+        # 同一组只从最小的ID展开一次：有更小的近似重复语句则跳过
+        if sentence_id in seen or not similar[sentence_id] or similar[sentence_id][0] < sentence_id:
+            continue
+        members = expand_duplicate_cluster(c, sentence_id, similar[sentence_id])
+        seen.update(members)
+        if members[0] == sentence_id:
+            clusters.append(members)
+
+    return clusters, ids[-1] if len(ids) == scan_size else None
+
+
+class KeywordMatcher:
+    """Aho-Corasick 多模式匹配自动机：一次扫描文本即可找出所有命中的关键词（忽略大小写）"""
+
+    def __init__(self, entries):
+        # entries: [(keyword, type, message), ...]，保持数据库中的顺序
+        self.entries = entries
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        # 构建字典树
+        for index, (keyword, _, _) in enumerate(entries):
+            state = 0
+            for ch in keyword.lower():
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = next_state
+                state = next_state
+            self._out[state] += (index,)
+
+        # 按层次计算失配指针，并沿失配指针合并输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def search(self, text):
+        """返回命中的关键词下标（按 entries 顺序）"""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = set(out[0])
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return sorted(hits)
+
+
+_keyword_matcher = None
+_keyword_matcher_lock = threading.Lock()
+
+
+# 关键词表不大，整表按ID顺序读取构建自动机
+KEYWORD_ENTRIES_SQL = "SELECT keyword, type, message FROM keywords ORDER BY id"
+
+
+def reload_keyword_matcher():
+    """从数据库重新构建关键词自动机，构建完成后整体替换"""
+    global _keyword_matcher
+    with _keyword_matcher_lock:
+        version, _ = data_version.get('keywords')
+        with db_pool.connection() as conn:
+            entries = conn.execute(KEYWORD_ENTRIES_SQL).fetchall()
+        _keyword_matcher = KeywordMatcher(entries)
+        _keyword_matcher.version = version
+        return _keyword_matcher
+
+
+def get_keyword_matcher():
+    """获取当前的关键词自动机，首次使用时构建；多进程部署时其他进程修改过关键词则重新构建"""
+    matcher = _keyword_matcher
+    if matcher is None or (data_version.shared and matcher.version != data_version.get('keywords')[0]):
+        matcher = reload_keyword_matcher()
+    return matcher
 
 
 def check_keywords(content):
     """检查内容中的关键词"""
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
-
-    c.execute("SELECT keyword, type, message FROM keywords")
-    keywords = c.fetchall()
-    conn.close()
+    matcher = get_keyword_matcher()
 
     errors = []
     warnings = []
 
-    for keyword, keyword_type, message in keywords:
-        # 使用正则表达式进行匹配（忽略大小写）
-        if re.search(re.escape(keyword), content, re.IGNORECASE):
-            if keyword_type == 'error':
-                errors.append({'keyword': keyword, 'message': message})
-            else:  # warning
-                warnings.append({'keyword': keyword, 'message': message})
+    for index in matcher.search(content):
+        keyword, keyword_type, message = matcher.entries[index]
+        if keyword_type == 'error':
+            errors.append({'keyword': keyword, 'message': message})
+        else:  # warning
+            warnings.append({'keyword': keyword, 'message': message})
 
     return {
         'has_errors': len(errors) > 0,
@@ -177,11 +2044,850 @@ def check_keywords(content):
     }
 
 
+_rescan_matcher = None
+
+
+def _init_rescan_worker(entries):
+    """子进程初始化：构建一次关键词自动机，之后每块语句复用"""
+    global _rescan_matcher
+    _rescan_matcher = KeywordMatcher(entries)
+
+
+def _rescan_chunk(rows):
+    """扫描一块语句，返回 [(语句ID, 关键词下标), ...]"""
+    return [(sentence_id, index) for sentence_id, content in rows for index in _rescan_matcher.search(content)]
+
+
+class KeywordRescan:
+    """关键词回溯扫描：把全部语句分块交给进程池匹配，命中记录先写入临时表，扫描成功后在一个事务内替换 keyword_hits。
+    全量模式重新扫描所有关键词；增量模式只扫描上次成功扫描之后新增的关键词"""
+
+    # 上次成功扫描时的最大关键词ID，增量模式从这里开始
+    SCANNED_KEYWORD_SQL = "SELECT COALESCE(MAX(max_keyword_id), 0) FROM keyword_scans WHERE status = 'done'"
+    KEYWORDS_SQL = "SELECT id, keyword, type, message FROM keywords WHERE id > ? ORDER BY id"
+    TOTAL_SQL = "SELECT COUNT(*) FROM sentences"
+    MAX_KEYWORD_SQL = "SELECT COALESCE(MAX(id), 0) FROM keywords"
+    # 按ID分块读取语句，参数为 (上一块最后的ID, 块大小)
+    CHUNK_SQL = "SELECT id, content FROM sentences WHERE id > ? ORDER BY id LIMIT ?"
+    PROGRESS_SQL = "UPDATE keyword_scans SET scanned = ?, hits = ? WHERE id = ?"
+    FINISH_SQL = "UPDATE keyword_scans SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?"
+    STAGING_TABLE_SQL = """
+        CREATE TEMP TABLE IF NOT EXISTS keyword_scan_hits (
+            sentence_id INTEGER NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            PRIMARY KEY (sentence_id, keyword_id)
+        ) WITHOUT ROWID
+    """
+    # 把临时表中的命中记录整体并入 keyword_hits，扫描期间被删除的语句和关键词不再写入。
+    # 用相关子查询逐条按主键确认，写成 IN (SELECT ...) 时规划器可能反过来遍历全部语句和关键词的组合去探测临时表
+    MERGE_SQL = """
+        INSERT OR IGNORE INTO keyword_hits (sentence_id, keyword_id)
+        SELECT h.sentence_id, h.keyword_id FROM temp.keyword_scan_hits h
+        WHERE EXISTS (SELECT 1 FROM sentences s WHERE s.id = h.sentence_id)
+          AND EXISTS (SELECT 1 FROM keywords k WHERE k.id = h.keyword_id)
+    """
+
+    def __init__(self, chunk_size=RESCAN_CHUNK_SIZE, workers=RESCAN_WORKERS):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mode):
+        """在后台线程中启动扫描，已有任务在运行时返回 False"""
+        with self._lock:
+            if self.running():
+                return False
+            self._thread = threading.Thread(target=self.run, args=(mode,), name='keyword-rescan', daemon=True)
+            self._thread.start()
+            return True
+
+    def run(self, mode):
+        """执行一次扫描，返回任务ID"""
+        with db_pool.connection() as conn:
+            c = conn.cursor()
+            since = 0
+            if mode == 'incremental':
+                c.execute(self.SCANNED_KEYWORD_SQL)
+                since = c.fetchone()[0]
+
+            c.execute(self.KEYWORDS_SQL, (since,))
+            keywords = c.fetchall()
+            c.execute(self.TOTAL_SQL)
+            total = c.fetchone()[0] if keywords else 0
+            c.execute(self.MAX_KEYWORD_SQL)
+            max_keyword_id = c.fetchone()[0]
+
+            c.execute("""
+                INSERT INTO keyword_scans (mode, status, max_keyword_id, keyword_count, total)
+                VALUES (?, 'running', ?, ?, ?)
+            """, (mode, max_keyword_id, len(keywords), total))
+            scan_id = c.lastrowid
+            conn.commit()
+
+            # 扫描期间命中记录只写临时表，失败或中断时 keyword_hits 保持上次扫描的结果，管理接口也看不到半截结果
+            c.execute(self.STAGING_TABLE_SQL)
+            c.execute("DELETE FROM temp.keyword_scan_hits")
+            conn.commit()
+
+            try:
+                self._scan(conn, scan_id, keywords, total)
+                if mode == 'full':
+                    c.execute("DELETE FROM keyword_hits")
+                c.execute(self.MERGE_SQL)
+                c.execute(self.FINISH_SQL, ('done', None, scan_id))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                app.logger.exception('关键词回溯扫描失败')
+                c.execute(self.FINISH_SQL, ('failed', str(e), scan_id))
+                conn.commit()
+            finally:
+                c.execute("DROP TABLE IF EXISTS temp.keyword_scan_hits")
+        return scan_id
+
+    def _chunks(self, conn):
+        """按ID分块读取语句，不长时间占用读事务"""
+        last_id = 0
+        while True:
+            rows = conn.execute(self.CHUNK_SQL, (last_id, self.chunk_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def _scan(self, conn, scan_id, keywords, total):
+        if not keywords:
+            return
+
+        keyword_ids = [row[0] for row in keywords]
+        entries = [row[1:] for row in keywords]
+        scanned = hits = 0
+
+        def record(rows, matches):
+            nonlocal scanned, hits
+            conn.executemany("INSERT OR IGNORE INTO temp.keyword_scan_hits (sentence_id, keyword_id) VALUES (?, ?)",
+                             [(sentence_id, keyword_ids[index]) for sentence_id, index in matches])
+            scanned += len(rows)
+            hits += len(matches)
+            conn.execute(self.PROGRESS_SQL, (scanned, hits, scan_id))
+            conn.commit()
+
+        if total <= self.chunk_size or self.workers <= 1:
+            _init_rescan_worker(entries)
+            for rows in self._chunks(conn):
+                record(rows, _rescan_chunk(rows))
+            return
+
+        # 同时在途的块数有上限，内存占用与语料规模无关；
+        # 扫描在多线程的服务进程中启动，子进程不用 fork 创建，见 RESCAN_START_METHOD
+        with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(RESCAN_START_METHOD),
+                                 initializer=_init_rescan_worker, initargs=(entries,)) as executor:
+            in_flight = deque()
+            for rows in self._chunks(conn):
+                in_flight.append((rows, executor.submit(_rescan_chunk, rows)))
+                if len(in_flight) >= self.workers * 2:
+                    done_rows, future = in_flight.popleft()
+                    record(done_rows, future.result())
+            while in_flight:
+                done_rows, future = in_flight.popleft()
+                record(done_rows, future.result())
+
+
+keyword_rescan = KeywordRescan()
+
+
+def length_class_of(length):
+    """长度对应的分级"""
+    for name, max_length in LENGTH_CLASSES:
+        if length <= max_length:
+            return name
+    return 'very-long'
+
+
+def length_class_ranges():
+    """每个长度分级覆盖的长度区间 [(分级, 最小长度, 最大长度或 None), ...]"""
+    ranges = []
+    start = 0
+    for name, max_length in LENGTH_CLASSES:
+        ranges.append((name, start, max_length))
+        start = max_length + 1
+    ranges.append(('very-long', start, None))
+    return ranges
+
+
+class ApprovedPool:
+    """已通过语句的ID池，在内存中随机抽样，避免每次 ORDER BY RANDOM() 全表扫描。
+    另按长度分级和作者分桶，桶内按 (长度, ID) 排序，按长度区间筛选时二分定位，抽样只与抽取数量有关"""
+
+    # 桶内元素为 长度 << ID_BITS | ID 的组合键
+    ID_BITS = 40
+    ID_MASK = (1 << ID_BITS) - 1
+
+    LOAD_SQL = "SELECT id, content, author FROM sentences WHERE status='approved'"
+    # 上次同步之后的变更，语句已不再是通过状态时内容为 NULL
+    SYNC_SQL = """
+        SELECT ch.seq, ch.sentence_id, s.content, s.author
+        FROM sentence_changes ch
+        LEFT JOIN sentences s ON s.id = ch.sentence_id AND s.status = 'approved'
+        WHERE ch.seq > ?
+        ORDER BY ch.seq
+    """
+
+    def __init__(self, max_age=APPROVED_POOL_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._ids = None  # array('q')，None 表示需要重新加载
+        self._meta = {}  # 语句ID -> (长度, 作者)
+        self._length_buckets = {}  # 长度分级 -> 有序 array('q')
+        self._author_buckets = {}  # 作者 -> 有序 array('q')
+        self._synced_at = 0.0
+        self._version = None  # 上次同步时已通过语句集合的版本号
+        self._seq = 0  # 已同步到的变更日志序号
+
+    def _ensure_loaded(self):
+        """按需从数据库加载ID池（调用方需持有锁）。之后只按变更日志同步增量：
+        多进程部署时其他进程修改过已通过的语句、或距上次同步超过 max_age（兜底直接修改数据库的情况）"""
+        version, _ = data_version.get('approved')
+        if self._ids is None:
+            self._version = version
+            self._load()
+        elif (time.monotonic() - self._synced_at >= self.max_age or
+              (data_version.shared and version != self._version)):
+            self._version = version
+            self._sync()
+
+    def _load(self):
+        """全量加载已通过语句，同一个读事务内记下变更日志的位置"""
+        # 长度在 Python 中计算：内容可能含有 NUL 字符，SQLite 的 length() 会在其处截断
+        with db_pool.connection() as conn:
+            conn.execute("BEGIN")
+            seq = conn.execute(CHANGES_MAX_SEQ_SQL).fetchone()[0]
+            rows = [(sentence_id, len(content), author) for sentence_id, content, author in
+                    conn.execute(self.LOAD_SQL)]
+            conn.commit()
+
+        authors = {}
+        length_keys = {}
+        author_keys = {}
+        self._ids = array('q')
+        self._meta = {}
+        for sentence_id, length, author in rows:
+            author = authors.setdefault(author, author)
+            key = length << self.ID_BITS | sentence_id
+            self._ids.append(sentence_id)
+            self._meta[sentence_id] = (length, author)
+            length_keys.setdefault(length_class_of(length), []).append(key)
+            author_keys.setdefault(author, []).append(key)
+        self._length_buckets = {name: array('q', sorted(keys)) for name, keys in length_keys.items()}
+        self._author_buckets = {name: array('q', sorted(keys)) for name, keys in author_keys.items()}
+        self._seq = seq
+        self._synced_at = time.monotonic()
+
+    def _sync(self):
+        """按变更日志应用上次同步之后的增量，只读取变化过的语句"""
+        with db_pool.connection() as conn:
+            rows = conn.execute(self.SYNC_SQL, (self._seq,)).fetchall()
+            rewound = not rows and conn.execute(CHANGES_MAX_SEQ_SQL).fetchone()[0] < self._seq
+
+        if rewound:
+            # 变更日志比已同步的位置还旧（数据库被整体替换过），只能全量加载
+            self._load()
+            return
+
+        for seq, sentence_id, content, author in rows:
+            if content is None:
+                self._remove(sentence_id)
+            elif self._meta.get(sentence_id) != (len(content), author):
+                self._remove(sentence_id)
+                self._add(sentence_id, len(content), author)
+            self._seq = seq
+        self._synced_at = time.monotonic()
+
+    def invalidate(self):
+        """标记ID池失效，下次抽样时全量重新加载"""
+        with self._lock:
+            self._ids = None
+
+    def refresh(self):
+        """批量修改之后调用：下次抽样时按变更日志同步增量"""
+        with self._lock:
+            self._synced_at = float('-inf')
+
+    def add(self, sentence_id, length, author):
+        """语句通过审核后加入ID池和对应的桶"""
+        with self._lock:
+            if self._ids is not None:
+                self._add(int(sentence_id), length, author)
+
+    def remove(self, sentence_id):
+        """语句被拒绝或删除后移出ID池和对应的桶"""
+        with self._lock:
+            if self._ids is not None:
+                self._remove(int(sentence_id))
+
+    def _add(self, sentence_id, length, author):
+        if sentence_id in self._meta:
+            return
+        key = length << self.ID_BITS | sentence_id
+        self._ids.append(sentence_id)
+        self._meta[sentence_id] = (length, author)
+        bisect.insort(self._length_buckets.setdefault(length_class_of(length), array('q')), key)
+        bisect.insort(self._author_buckets.setdefault(author, array('q')), key)
+
+    def _remove(self, sentence_id):
+        """与末尾元素交换后弹出"""
+        if sentence_id not in self._meta:
+            return
+        i = self._ids.index(sentence_id)
+        self._ids[i] = self._ids[-1]
+        self._ids.pop()
+
+        length, author = self._meta.pop(sentence_id)
+        key = length << self.ID_BITS | sentence_id
+        for buckets, name in ((self._length_buckets, length_class_of(length)), (self._author_buckets, author)):
+            bucket = buckets[name]
+            del bucket[bisect.bisect_left(bucket, key)]
+            if not bucket:
+                del buckets[name]
+
+    def sample(self, count, min_len=None, max_len=None, author=None):
+        """无放回地均匀抽取最多 count 个语句ID，可按长度区间和作者筛选"""
+        with self._lock:
+            self._ensure_loaded()
+            if min_len is None and max_len is None and author is None:
+                ids = self._ids
+                picks = random.sample(range(len(ids)), min(count, len(ids)))
+                return [ids[i] for i in picks]
+
+            low = max(min_len or 0, 0)
+            high = max_len if max_len is not None else self.ID_MASK >> 1
+            if author is not None:
+                buckets = [self._author_buckets.get(author, ())]
+            else:
+                buckets = [self._length_buckets.get(name, ()) for name, start, end in length_class_ranges()
+                           if start <= high and (end is None or end >= low)]
+
+            # 每个桶内满足长度区间的部分是一段连续下标
+            segments = []
+            total = 0
+            for bucket in buckets:
+                lo = bisect.bisect_left(bucket, low << self.ID_BITS)
+                hi = bisect.bisect_left(bucket, (high + 1) << self.ID_BITS)
+                if hi > lo:
+                    segments.append((total, bucket, lo))
+                    total += hi - lo
+
+            result = []
+            for pick in random.sample(range(total), min(count, total)):
+                for offset, bucket, lo in reversed(segments):
+                    if pick >= offset:
+                        result.append(bucket[lo + pick - offset] & self.ID_MASK)
+                        break
+            return result
+
+
+approved_pool = ApprovedPool()
+
+
+class TTLCache:
+    """带过期时间的内存缓存，数据变化时调用 clear() 立即失效"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                return item[1]
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+leaderboard_cache = TTLCache(LEADERBOARD_CACHE_TTL)
+
+
+class DataVersion:
+    """数据版本号：每次写操作后递增，读接口据此生成 ETag/Last-Modified，未变化时直接返回 304。
+    版本号存放在共享内存中，fork 出的工作进程看到同一份版本号。
+    sentences 在任何语句变化时递增；approved 只在已通过语句的集合或内容可能变化时递增（待审核投稿不影响）"""
+
+    SCOPES = ('sentences', 'approved', 'keywords')
+
+    def __init__(self):
+        self._lock = multiprocessing.Lock()
+        # 每个范围两项：版本号、最后修改时间（Unix 秒）
+        self._values = multiprocessing.RawArray('q', 2 * len(self.SCOPES))
+        # 以启动时间为初始版本，保证重启后不会与之前发出的 ETag 重复
+        start = int(time.time() * 1000)
+        for i in range(len(self.SCOPES)):
+            self._values[2 * i] = start
+            self._values[2 * i + 1] = int(time.time())
+        # 多进程部署时为 True，各进程的内存缓存需要据此发现其他进程的写入
+        self.shared = False
+
+    def bump(self, scope):
+        i = 2 * self.SCOPES.index(scope)
+        with self._lock:
+            self._values[i] += 1
+            self._values[i + 1] = int(time.time())
+
+    def get(self, scope):
+        """返回 (版本号, 最后修改时间)"""
+        i = 2 * self.SCOPES.index(scope)
+        with self._lock:
+            version, modified = self._values[i], self._values[i + 1]
+        return version, datetime.fromtimestamp(modified, timezone.utc)
+
+
+data_version = DataVersion()
+
+
+class ReadSnapshot:
+    """公开只读接口使用的内存数据库快照：只复制已通过的语句和公开接口读取的表（全文索引、作者汇总、
+    各状态语句数）到共享缓存的内存数据库，请求从按快照代数区分的连接池取只读连接。已通过语句的版本变化后延迟
+    debounce 秒在后台重建，连续写入只触发一次重建；新快照建好后整体替换，旧快照在最后一个连接关闭后释放"""
+
+    # 原样复制的汇总表
+    TABLES = ('author_stats', 'sentence_counts')
+    # 全文索引的影子表，直接复制索引数据，不必重新分词
+    FTS_SHADOW_TABLES = ('sentences_fts_data', 'sentences_fts_idx', 'sentences_fts_content',
+                         'sentences_fts_docsize', 'sentences_fts_config')
+
+    def __init__(self, enabled=READ_SNAPSHOT, debounce=READ_SNAPSHOT_DEBOUNCE, size=DB_POOL_SIZE):
+        self.enabled = enabled
+        self.debounce = debounce
+        self.size = size
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._idle = []  # 当前快照的空闲只读连接
+        self._current = None  # (代数, 内存库名, 持有连接, 数据版本号, 最后修改时间)
+        self._generation = 0
+        self._timer = None
+        self.built_at = None
+        self.build_seconds = None
+
+    def _uri(self, name):
+        return f'file:{name}?mode=memory&cache=shared'
+
+    def rebuild(self):
+        """复制一份新快照并替换当前快照"""
+        with self._build_lock:
+            with self._lock:
+                self._timer = None
+            started = time.perf_counter()
+            # 先取版本号：复制过程中再有写入，版本号对不上会再重建一次
+            version, last_modified = data_version.get('approved')
+            self._generation += 1
+            name = f'sentences-snapshot-{os.getpid()}-{self._generation}'
+            holder = sqlite3.connect(self._uri(name), uri=True, check_same_thread=False, isolation_level=None)
+            try:
+                self._copy(holder)
+            except sqlite3.Error:
+                holder.close()
+                raise
+
+            with self._lock:
+                old = self._current
+                self._current = (self._generation, name, holder, version, last_modified)
+                idle, self._idle = self._idle, []
+            # 旧快照的空闲连接直接关闭，借出中的连接归还时关闭
+            for conn in idle:
+                conn.close()
+            if old is not None:
+                old[2].close()
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def _copy(self, holder):
+        """在一个读事务内把磁盘数据库中公开接口需要的部分复制到 holder 所在的内存数据库"""
+        holder.execute("PRAGMA busy_timeout = 5000")
+        holder.execute("ATTACH DATABASE ? AS src", (DATABASE,))
+        try:
+            holder.execute("BEGIN")
+            holder.execute("""
+                CREATE TABLE sentences (
+                    id INTEGER PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    author TEXT,
+                    status TEXT
+                )
+            """)
+            holder.execute("""
+                INSERT INTO main.sentences (id, content, author, status)
+                SELECT id, content, author, status FROM src.sentences WHERE status = 'approved'
+            """)
+
+            for table in self.TABLES:
+                schema = holder.execute(
+                    "SELECT sql FROM src.sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index') "
+                    "AND sql IS NOT NULL ORDER BY type = 'index'", (table,)).fetchall()
+                for (sql,) in schema:
+                    holder.execute(sql)
+                holder.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}")
+
+            holder.execute("CREATE VIRTUAL TABLE sentences_fts USING fts5(content, author, tokenize='trigram')")
+            for table in self.FTS_SHADOW_TABLES:
+                holder.execute(f"DELETE FROM main.{table}")
+                holder.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}")
+            holder.execute("COMMIT")
+        except sqlite3.Error:
+            if holder.in_transaction:
+                holder.execute("ROLLBACK")
+            raise
+        finally:
+            holder.execute("DETACH DATABASE src")
+
+    def _schedule(self):
+        """已通过语句的版本变化后安排一次延迟重建（已安排则忽略）"""
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.debounce, self._rebuild_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except sqlite3.Error as e:
+            app.logger.warning('重建读快照失败: %s', e)
+            with self._lock:
+                self._timer = None
+
+    def _snapshot(self):
+        current = self._current
+        if current is None:
+            self.rebuild()
+            current = self._current
+        elif current[3] != data_version.get('approved')[0]:
+            self._schedule()
+        return current
+
+    def acquire(self):
+        """取出当前快照的一个空闲只读连接，没有则新建"""
+        generation, name = self._snapshot()[:2]
+        with self._lock:
+            if self._idle and self._idle[-1].generation == generation:
+                return self._idle.pop()
+        conn = sqlite3.connect(self._uri(name), uri=True, check_same_thread=False,
+                               cached_statements=SQLITE_CACHED_STATEMENTS, factory=TimedConnection)
+        conn.execute("PRAGMA query_only = ON")
+        conn.generation = generation
+        return conn
+
+    def release(self, conn):
+        """归还连接；快照已经替换或空闲连接已满时关闭"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            current = self._current
+            if current is not None and conn.generation == current[0] and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def version(self, scope):
+        """公开接口生成 ETag 用的版本号：已通过语句的数据以快照建立时的版本为准"""
+        if self.enabled and scope == 'approved':
+            return self._snapshot()[3:5]
+        return data_version.get(scope)
+
+    def status(self):
+        return {
+            'generation': self._current[0] if self._current else 0,
+            'age_seconds': round(time.time() - self.built_at, 3) if self.built_at else None,
+            'build_seconds': round(self.build_seconds, 3) if self.build_seconds is not None else None,
+        }
+
+
+read_snapshot = ReadSnapshot()
+
+
+def get_read_db():
+    """公开只读接口使用的连接：启用读快照时为内存快照，否则为普通连接"""
+    if not read_snapshot.enabled:
+        return get_db()
+    if 'read_db' not in g:
+        g.read_db = read_snapshot.acquire()
+    return g.read_db
+
+
+def data_changed(*scopes):
+    """写接口标记本次请求实际修改了哪些数据，由 bumps_data_version 递增版本号"""
+    g.setdefault('changed_scopes', set()).update(scopes)
+
+
+def bumps_data_version(*scopes):
+    """装饰写接口：请求处理完后只递增实际有变化的数据的版本号。sentences、keywords 由接口调用 data_changed 标记；
+    approved 看已通过语句的变更日志（由触发器维护，只有已通过语句增删或修改时才写入）在请求前后是否前进，
+    失败的请求和只涉及待审核语句的操作不会让公开接口的缓存失效"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            seq = get_db().execute(CHANGES_MAX_SEQ_SQL).fetchone()[0] if 'approved' in scopes else None
+            response = app.make_response(view(*args, **kwargs))
+            changed = g.pop('changed_scopes', set())
+            # 期间其他进程的写入也会让变更日志前进，多递增一次版本号无妨
+            if seq is not None and get_db().execute(CHANGES_MAX_SEQ_SQL).fetchone()[0] > seq:
+                changed.add('approved')
+            for scope in scopes:
+                if scope in changed:
+                    data_version.bump(scope)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional(scope, max_age=0, private=False, window=None):
+    """装饰只读接口：根据数据版本生成 ETag/Last-Modified，命中 If-None-Match/If-Modified-Since 时
+    直接返回 304，不访问数据库。window 秒不为空时 ETag 还按时间窗口变化（用于包含访问计数的接口）"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # 管理员接口未登录时交给原视图返回 401
+            if private and not session.get('admin'):
+                return view(*args, **kwargs)
+
+            # 公开接口的数据可能来自读快照，以快照的版本为准
+            version, last_modified = data_version.get(scope) if private else read_snapshot.version(scope)
+            etag = f'{scope}-{version}'
+            if window:
+                etag += f'-{int(time.time() // window)}'
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (not window and request.if_modified_since is not None and
+                                last_modified <= request.if_modified_since)
+
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            if private:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            else:
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+            return response
+        return wrapper
+    return decorator
+
+
+def approved_by_ids_sql(count):
+    """按ID取已通过语句的 SQL，参数为 count 个语句ID。
+    status 前加 + 不让它使用索引：否则统计信息显示已通过的语句占比不高时，规划器会改走状态索引读出全部已通过的语句"""
+    return f"SELECT id, content, author FROM sentences WHERE id IN ({','.join('?' * count)}) AND +status = 'approved'"
+
+
+def fetch_random_sentences(count, **filters):
+    """从ID池随机抽取语句（可按 min_len/max_len/author 筛选），返回 [(content, author), ...]"""
+    for _ in range(2):
+        ids = approved_pool.sample(count, **filters)
+        if not ids:
+            return []
+
+        rows = {}
+        missing = ids
+        # 读快照可能还没包含刚通过的语句，缺的才取普通连接再查一次
+        for get_conn in ((get_read_db, get_db) if read_snapshot.enabled else (get_db,)):
+            c = get_conn().cursor()
+            c.execute(approved_by_ids_sql(len(missing)), missing)
+            rows.update((row[0], (row[1], row[2])) for row in c.fetchall())
+            missing = [sentence_id for sentence_id in ids if sentence_id not in rows]
+            if not missing:
+                break
+
+        if len(rows) == len(ids):
+            return [rows[sentence_id] for sentence_id in ids]
+
+        # ID池与数据库不一致（数据库被直接修改过），重新加载后再抽一次
+        approved_pool.invalidate()
+
+    return [rows[sentence_id] for sentence_id in ids if sentence_id in rows]
+
+
+def length_class(text):
+    """按长度给语句分级，对应首页的字体大小"""
+    return length_class_of(len(text))
+
+
+index_cache = TTLCache(INDEX_CACHE_TTL)
+stats_cache = TTLCache(STATS_MAX_AGE)
+
+# 首页模板中逐请求替换的字段
+INDEX_FIELDS = ('sentence', 'author', 'font_class',
+                'total_sentences', 'today_views', 'pending_sentences', 'today_api_calls')
+INDEX_FIELD_PATTERN = re.compile('\x02(\\w+)\x03')
+_index_shell = None
+
+
+def render_index_shell():
+    """渲染首页模板外壳（动态字段为占位符），只渲染一次"""
+    global _index_shell
+    if _index_shell is None or app.debug:
+        _index_shell = render_template('index.html', **{field: f'\x02{field}\x03' for field in INDEX_FIELDS})
+    return _index_shell
+
+
+class StaticAssets:
+    """启动时为静态文件计算内容哈希，生成带指纹的文件名（script.<hash>.js）并预先 gzip 压缩，
+    模板中的 url_for('static', ...) 自动改写为带指纹的地址，响应可以长期缓存"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.fingerprinted = {}  # 原文件名 -> 带指纹的文件名
+        self.assets = {}  # 带指纹的文件名 -> (内容, gzip 内容或 None, 哈希, MIME 类型)
+        self.load()
+
+    def load(self):
+        fingerprinted = {}
+        assets = {}
+        for root, _, files in os.walk(self.folder):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                filename = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, ext = os.path.splitext(filename)
+                name = f'{stem}.{digest}{ext}'
+                compressed = None
+                if ext in STATIC_COMPRESSIBLE:
+                    compressed = gzip_bytes(data, 9)
+                    if len(compressed) >= len(data):
+                        compressed = None
+                fingerprinted[filename] = name
+                assets[name] = (data, compressed, digest,
+                                mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        self.fingerprinted, self.assets = fingerprinted, assets
+
+
+def gzip_bytes(data, level):
+    """gzip 压缩"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+static_assets = StaticAssets(app.static_folder)
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """url_for('static', filename=...) 改写为带指纹的文件名（调试模式下保持原文件名，方便修改后直接刷新）"""
+    if endpoint == 'static' and not app.debug:
+        name = static_assets.fingerprinted.get(values.get('filename'))
+        if name is not None:
+            values['filename'] = name
+
+
+def serve_static(filename):
+    """静态文件：带指纹的文件名返回预压缩内容和长期缓存头，其他情况交给 Flask 默认处理"""
+    asset = static_assets.assets.get(filename)
+    if asset is None:
+        return app.send_static_file(filename)
+
+    data, compressed, digest, mimetype = asset
+    if request.if_none_match.contains(digest):
+        response = Response(status=304)
+    elif compressed is not None and request.accept_encodings['gzip'] > 0:
+        response = Response(compressed, mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(data, mimetype=mimetype)
+    response.set_etag(digest)
+    response.cache_control.public = True
+    response.cache_control.max_age = STATIC_MAX_AGE
+    response.cache_control.immutable = True
+    if compressed is not None:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = serve_static
+
+
+@app.after_request
+def compress_json(response):
+    """按 Accept-Encoding 压缩较大的 JSON 响应（gzip 优先，其次 deflate）"""
+    if (response.mimetype != 'application/json' or response.direct_passthrough or response.is_streamed or
+            'Content-Encoding' in response.headers or response.status_code < 200 or response.status_code == 304):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    if request.accept_encodings['gzip'] > 0:
+        response.set_data(gzip_bytes(data, COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    elif request.accept_encodings['deflate'] > 0:
+        response.set_data(zlib.compress(data, COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'deflate'
+    return response
+
+
 @app.route('/')
 def index():
     """首页 - 显示随机语句"""
     update_page_view()  # 更新访问统计
-    return render_template('index.html')
+
+    # 随机语句和统计数据都取自进程内缓存；语句缓存随已通过语句的版本失效
+    version, _ = data_version.get('approved')
+    cached = index_cache.get('sentences')
+    if cached is not None and cached[0] == version:
+        sentences = cached[1]
+    else:
+        sentences = fetch_random_sentences(INDEX_SENTENCE_CACHE_SIZE)
+        index_cache.set('sentences', (version, sentences))
+
+    stats = stats_cache.get('stats')
+    if stats is None:
+        stats = build_stats(get_db().cursor())
+        stats_cache.set('stats', stats)
+
+    content, author = random.choice(sentences) if sentences else ('暂无语句，欢迎提交！', '系统')
+    values = {
+        'sentence': content,
+        'author': author,
+        'font_class': length_class(content),
+        'total_sentences': stats['total_sentences'],
+        'today_views': stats['today_views'],
+        'pending_sentences': stats['pending_sentences'],
+        'today_api_calls': stats['today_api_calls'],
+    }
+    return INDEX_FIELD_PATTERN.sub(lambda m: str(escape(values[m.group(1)])), render_index_shell())
+
+
+def random_filters():
+    """解析随机语句的筛选参数 min_len、max_len、author"""
+    filters = {
+        'min_len': request.args.get('min_len', type=int),
+        'max_len': request.args.get('max_len', type=int),
+        'author': request.args.get('author', '').strip() or None
+    }
+    return {key: value for key, value in filters.items() if value is not None}
 
 
 @app.route('/api/random')
@@ -189,16 +2895,12 @@ def get_random_sentence():
     """获取随机审核通过的语句"""
     update_api_usage()  # 更新API使用统计
 
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
-    c.execute("SELECT content, author FROM sentences WHERE status='approved' ORDER BY RANDOM() LIMIT 1")
-    result = c.fetchone()
-    conn.close()
+    results = fetch_random_sentences(1, **random_filters())
 
-    if result:
+    if results:
         return jsonify({
-            'sentence': result[0],
-            'author': result[1]
+            'sentence': results[0][0],
+            'author': results[0][1]
         })
     else:
         return jsonify({
@@ -218,11 +2920,7 @@ def get_multiple_random_sentences(count):
     if count < 1:
         count = 1
 
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
-    c.execute("SELECT content, author FROM sentences WHERE status='approved' ORDER BY RANDOM() LIMIT ?", (count,))
-    results = c.fetchall()
-    conn.close()
+    results = fetch_random_sentences(count, **random_filters())
 
     sentences = []
     for content, author in results:
@@ -237,70 +2935,339 @@ def get_multiple_random_sentences(count):
     })
 
 
+@app.route('/api/random/batch')
+def get_random_batch():
+    """首页预取用：一次返回多个随机语句和统计数据快照"""
+    count = request.args.get('count', 10, type=int)
+    count = max(1, min(count, 50))
+
+    results = fetch_random_sentences(count)
+
+    # 按返回的语句数计入API使用统计，与逐条调用 /api/random 保持一致
+    usage_counters.incr('api_usage', max(len(results), 1))
+
+    sentences = []
+    for content, author in results:
+        sentences.append({
+            'content': content,
+            'author': author
+        })
+
+    return jsonify({
+        'count': len(sentences),
+        'sentences': sentences,
+        'stats': build_stats(get_db().cursor())
+    })
+
+
+class GzipStream:
+    """边生成边 gzip 压缩的流"""
+
+    def __init__(self, chunks, level=6):
+        self.chunks = chunks
+        self.level = level
+
+    def __iter__(self):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in self.chunks:
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+# 导出按ID顺序读取整张表：status 前加 + 不让它使用状态索引，否则要先把全部已通过的语句按ID排序才能输出第一行
+EXPORT_SQL = "SELECT id, content, author FROM sentences WHERE +status = 'approved' ORDER BY id"
+
+
+@app.route('/api/export')
+def export_sentences():
+    """流式导出全部已通过语句（NDJSON 或 CSV），响应头 X-Changes-Since 为导出时的变更序号，
+    镜像之后从该序号开始调用 /api/changes 增量同步"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': '导出格式只能是 ndjson 或 csv'}), 400
+
+    conn = get_db()
+
+    # 在同一个读事务中取变更序号和数据，保证两者一致
+    conn.execute("BEGIN")
+    since = conn.execute(CHANGES_MAX_SEQ_SQL).fetchone()[0]
+    rows = conn.execute(EXPORT_SQL)
+
+    def generate():
+        try:
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(['id', 'content', 'author'])
+                for i, row in enumerate(rows, 1):
+                    writer.writerow(row)
+                    if i % EXPORT_CHUNK_ROWS == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                lines = []
+                for sentence_id, content, author in rows:
+                    lines.append(json.dumps({'id': sentence_id, 'content': content, 'author': author},
+                                            ensure_ascii=False) + '\n')
+                    if len(lines) >= EXPORT_CHUNK_ROWS:
+                        yield ''.join(lines)
+                        lines = []
+                yield ''.join(lines)
+        finally:
+            conn.rollback()
+
+    body = generate()
+    gzip_enabled = request.accept_encodings['gzip'] > 0
+    if gzip_enabled:
+        body = GzipStream(body, COMPRESS_LEVEL)
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['X-Changes-Since'] = str(since)
+    response.headers['Content-Disposition'] = f'attachment; filename=sentences.{export_format}'
+    response.vary.add('Accept-Encoding')
+    if gzip_enabled:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+# 序号大于 since 的变更，参数为 (since, 条数)；delete 墓碑不关联语句内容
+CHANGES_SQL = """
+    SELECT ch.seq, ch.sentence_id, ch.op, ch.changed_at, s.content, s.author
+    FROM sentence_changes ch
+    LEFT JOIN sentences s ON s.id = ch.sentence_id AND ch.op = 'upsert'
+    WHERE ch.seq > ?
+    ORDER BY ch.seq
+    LIMIT ?
+"""
+
+
+@app.route('/api/changes')
+def get_changes():
+    """增量变更订阅：返回序号大于 since 的变更（upsert 带内容，delete 为墓碑）"""
+    since = request.args.get('since', 0, type=int)
+    if not 0 <= since <= SQLITE_MAX_INTEGER:
+        return jsonify({'error': 'since 超出范围'}), 400
+    limit = request.args.get('limit', CHANGES_MAX_LIMIT, type=int)
+    limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+
+    conn = get_db()
+    c = conn.cursor()
+    c.execute(CHANGES_SQL, (since, limit + 1))
+    rows = c.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = []
+    for seq, sentence_id, op, changed_at, content, author in rows:
+        change = {'seq': seq, 'id': sentence_id, 'op': op, 'changed_at': changed_at}
+        if op == 'upsert':
+            change['content'] = content
+            change['author'] = author
+        changes.append(change)
+
+    return jsonify({
+        'changes': changes,
+        'next_since': rows[-1][0] if rows else since,
+        'has_more': has_more
+    })
+
+
+def encode_cursor(values):
+    """把分页位置编码为不透明的游标字符串"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, *types):
+    """解析游标，无效时返回 None；给出 types 时游标须为对应长度的列表，且每个值符合 cursor_value_ok"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if types and not (isinstance(values, list) and len(values) == len(types) and
+                      all(cursor_value_ok(value, kind) for value, kind in zip(values, types))):
+        return None
+    return values
+
+
+def cursor_value_ok(value, kind):
+    """游标中的值能否作为 SQL 参数：int 须在 SQLite 整数范围内，float 也接受整数但不接受 NaN/无穷"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return kind in (int, float) and -2 ** 63 <= value < 2 ** 63
+    if isinstance(value, float):
+        return kind is float and math.isfinite(value)
+    return isinstance(value, kind)
+
+
+def escape_like(text):
+    """转义 LIKE 模式中的通配符，配合 ESCAPE '\\' 使用"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# 搜索结果片段的长度（字符数），以及生成片段时标记匹配位置的控制字符；
+# 片段先按纯文本做 HTML 转义，再把标记换成 <mark>，语句内容中的标签不会原样输出
+SNIPPET_LENGTH = 32
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'
+
+
+def render_snippet(text):
+    """HTML 转义片段，再把匹配标记换成 <mark></mark>"""
+    return str(escape(text)).replace(SNIPPET_OPEN, '<mark>').replace(SNIPPET_CLOSE, '</mark>')
+
+
+def substring_snippet(content, keyword):
+    """短关键词子串匹配的片段：取第一处匹配前后的内容，标出其中的全部匹配"""
+    content = content.replace(SNIPPET_OPEN, '').replace(SNIPPET_CLOSE, '')
+    # 与 SQLite 的 LIKE 一样不区分大小写
+    pattern = re.compile(re.escape(keyword), re.IGNORECASE)
+    match = pattern.search(content)
+    start = max(0, match.start() - SNIPPET_LENGTH // 2) if match else 0
+    end = start + SNIPPET_LENGTH
+    marked = pattern.sub(lambda m: SNIPPET_OPEN + m.group() + SNIPPET_CLOSE, content[start:end])
+    return ('…' if start > 0 else '') + render_snippet(marked) + ('…' if end < len(content) else '')
+
+
+def search_query(keyword, author='', cursor=None):
+    """搜索的 SQL 和参数（不含 LIMIT），cursor 为上一页最后一条的 [相关度或 -rowid, rowid]"""
+    conditions = []
+    params = []
+    if len(keyword) >= 3:
+        # trigram 分词至少需要3个字符，按 bm25 相关度排序；只匹配内容列，与下面的子串匹配一致
+        conditions.append("sentences_fts MATCH ?")
+        params.append('content : "' + keyword.replace('"', '""') + '"')
+        order_column = 'rank'
+        snippet = (f"snippet(sentences_fts, 0, char({ord(SNIPPET_OPEN)}), char({ord(SNIPPET_CLOSE)}), "
+                   f"'…', {SNIPPET_LENGTH})")
+    else:
+        # 关键词太短无法使用 MATCH，在索引表（只含已通过语句）上做子串匹配，按时间倒序；片段由 substring_snippet 生成
+        conditions.append("content LIKE ? ESCAPE '\\'")
+        params.append(f'%{escape_like(keyword)}%')
+        order_column = '-rowid'
+        snippet = 'NULL'
+
+    if author:
+        conditions.append("author = ?")
+        params.append(author)
+
+    if cursor:
+        conditions.append(f"({order_column} > ? OR ({order_column} = ? AND rowid > ?))")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+
+    return f"""
+        SELECT rowid, content, author, {order_column}, {snippet}
+        FROM sentences_fts
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {order_column}, rowid
+    """, params
+
+
 @app.route('/api/search')
 def search_sentences():
-    """搜索语句"""
+    """搜索语句（全文索引，按相关度排序，支持按作者筛选和游标分页）"""
     keyword = request.args.get('keyword', '').strip()
     if not keyword:
         return jsonify({'sentences': []})
 
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
-
-    # 使用LIKE进行模糊搜索
-    search_pattern = f'%{keyword}%'
-    c.execute(
-        "SELECT content, author FROM sentences WHERE status='approved' AND content LIKE ? ORDER BY RANDOM() LIMIT 20",
-        (search_pattern,))
+    author = request.args.get('author', '').strip()
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    cursor = None
+    if request.args.get('cursor'):
+        # [相关度或 -rowid, rowid]
+        cursor = decode_cursor(request.args['cursor'], float, int)
+        if cursor is None:
+            return jsonify({'error': '无效的分页游标'}), 400
+
+    sql, params = search_query(keyword, author, cursor)
+    c = get_read_db().cursor()
+    c.execute(sql + " LIMIT ?", params + [limit + 1])
     results = c.fetchall()
-    conn.close()
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor([last[3], last[0]])
 
     sentences = []
-    for content, author in results:
+    for sentence_id, content, author_name, _, snippet in results:
         sentences.append({
+            'id': sentence_id,
             'content': content,
-            'author': author
+            'author': author_name,
+            'snippet': render_snippet(snippet) if snippet is not None else substring_snippet(content, keyword)
         })
 
     return jsonify({
         'count': len(sentences),
-        'sentences': sentences
+        'sentences': sentences,
+        'next_cursor': next_cursor
     })
 
 
 @app.route('/api/stats')
+@conditional('sentences', max_age=STATS_MAX_AGE, window=STATS_MAX_AGE)
 def get_stats():
     """获取统计数据"""
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
+    return jsonify(build_stats(get_db().cursor()))
 
-    # 获取总语句数
-    c.execute("SELECT COUNT(*) FROM sentences WHERE status='approved'")
-    total_sentences = c.fetchone()[0]
+
+@app.route('/api/stats/history')
+def get_stats_history():
+    """按接口的访问量时间序列（resolution 为 hour 或 day，start/end 为 Unix 时间戳）"""
+    resolution = request.args.get('resolution', 'hour')
+    if resolution not in ('hour', 'day'):
+        return jsonify({'error': 'resolution 只能是 hour 或 day'}), 400
+    width = 3600 if resolution == 'hour' else 86400
+
+    endpoint = request.args.get('endpoint', '').strip() or None
+    end = request.args.get('end', int(time.time()), type=int)
+    start = request.args.get('start', end - (86400 if resolution == 'hour' else 30 * 86400), type=int)
+    start = max(start // width * width, end - USAGE_HISTORY_MAX_POINTS * width)
+    if start >= end:
+        return jsonify({'error': '时间范围无效'}), 400
+
+    points = usage_counters.history(get_db().cursor(), endpoint, start, end, resolution)
+    return jsonify({
+        'endpoint': endpoint,
+        'resolution': resolution,
+        'start': start,
+        'end': end,
+        'points': [{'bucket': bucket, 'count': count} for bucket, count in points]
+    })
+
+
+def build_stats(c):
+    """汇总统计数据"""
+    # 获取各状态语句数（汇总表，常数时间；包含待审核数，不随读快照滞后，直接读数据库）
+    counts, version, updated_at = get_sentence_counts(c)
+    total_sentences = counts.get('approved', 0)
 
     # 获取今日访问量
     today = date.today().isoformat()
-    c.execute("SELECT view_count FROM page_views WHERE view_date = ?", (today,))
-    result = c.fetchone()
-    today_views = result[0] if result else 0
+    today_views = usage_counters.total(c, 'page_views', today)
 
     # 获取待审核语句数
-    c.execute("SELECT COUNT(*) FROM sentences WHERE status='pending'")
-    pending_sentences = c.fetchone()[0]
+    pending_sentences = counts.get('pending', 0)
 
     # 获取今日API调用次数
-    c.execute("SELECT api_count FROM api_usage WHERE access_date = ?", (today,))
-    result = c.fetchone()
-    today_api_calls = result[0] if result else 0
+    today_api_calls = usage_counters.total(c, 'api_usage', today)
 
-    conn.close()
-
-    return jsonify({
+    return {
         'total_sentences': total_sentences,
         'today_views': today_views,
         'pending_sentences': pending_sentences,
-        'today_api_calls': today_api_calls
-    })
+        'today_api_calls': today_api_calls,
+        'version': version,
+        'updated_at': updated_at
+    }
 
 
 @app.route('/submit', methods=['GET', 'POST'])
@@ -323,11 +3290,7 @@ def submit_sentence():
         if len(author) > 50:
             errors.append('署名不能超过50字')
 
-        # 检查是否重复
-        if content and check_duplicate(content):
-            errors.append('该语句已存在，请勿重复提交')
-
-        # 检查关键词
+        # 检查关键词（查重和入库由投稿队列在后台完成）
         keyword_check = check_keywords(content)
         if keyword_check['has_errors']:
             error_keywords = [item['keyword'] for item in keyword_check['errors']]
@@ -338,16 +3301,7 @@ def submit_sentence():
             if not author:
                 author = '匿名'
 
-            # 生成内容哈希
-            content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-
-            # 保存到数据库
-            conn = sqlite3.connect('sentences.db')
-            c = conn.cursor()
-            c.execute("INSERT INTO sentences (content, author, status, content_hash) VALUES (?, ?, 'pending', ?)",
-                      (content, author, content_hash))
-            conn.commit()
-            conn.close()
+            submission_queue.put(content, author)
 
             # 提交成功后，保留署名但清空内容
             return render_template('submit.html', success=True, errors=[])
@@ -400,40 +3354,179 @@ def admin_logout():
     return jsonify({'success': True})
 
 
+SENTENCE_COLUMNS = 'id, content, author, status, submitted_at, reviewed_at, reviewed_by, content_hash'
+
+
+def sentence_to_dict(row):
+    """把 SENTENCE_COLUMNS 查询结果转换为字典"""
+    return {
+        'id': row[0],
+        'content': row[1],
+        'author': row[2],
+        'status': row[3],
+        'submitted_at': row[4],
+        'reviewed_at': row[5],
+        'reviewed_by': row[6],
+        'content_hash': row[7]
+    }
+
+
+def admin_sentences_query(status_filter='all', text_filter='', author_filter='', cursor=None):
+    """管理后台语句列表的 SQL 和参数（按提交时间倒序，cursor 为上一页最后一条的 [submitted_at, id]）"""
+    conditions = []
+    params = []
+    if status_filter != 'all':
+        conditions.append("status = ?")
+        params.append(status_filter)
+    if text_filter:
+        conditions.append("content LIKE ? ESCAPE '\\'")
+        params.append(f'%{escape_like(text_filter)}%')
+    if author_filter:
+        conditions.append("author = ?")
+        params.append(author_filter)
+    if cursor:
+        conditions.append("(submitted_at, id) < (?, ?)")
+        params.extend(cursor)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"SELECT {SENTENCE_COLUMNS} FROM sentences {where} ORDER BY submitted_at DESC, id DESC", params
+
+
 @app.route('/api/admin/sentences')
+@conditional('sentences', private=True)
 def get_all_sentences():
-    """获取所有语句（管理员用）"""
+    """获取语句列表（管理员用），按提交时间倒序游标分页；format=ndjson 时流式返回全部结果"""
     if not session.get('admin'):
         return jsonify({'error': 'Unauthorized'}), 401
 
-    status_filter = request.args.get('status', 'all')
+    stream = request.args.get('format') == 'ndjson'
+
+    cursor = None
+    if not stream and request.args.get('cursor'):
+        # [submitted_at, id]
+        cursor = decode_cursor(request.args['cursor'], str, int)
+        if cursor is None:
+            return jsonify({'error': '无效的分页游标'}), 400
+
+    sql, params = admin_sentences_query(request.args.get('status', 'all'), request.args.get('q', '').strip(),
+                                        request.args.get('author', '').strip(), cursor)
+
+    conn = get_db()
+
+    if stream:
+        def generate():
+            for row in conn.execute(sql, params):
+                yield json.dumps(sentence_to_dict(row), ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit', ADMIN_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, ADMIN_MAX_PAGE_SIZE))
 
-    conn = sqlite3.connect('sentences.db')
     c = conn.cursor()
+    c.execute(sql + " LIMIT ?", params + [limit + 1])
+    rows = c.fetchall()
 
-    if status_filter == 'all':
-        c.execute("SELECT * FROM sentences ORDER BY submitted_at DESC")
-    else:
-        c.execute("SELECT * FROM sentences WHERE status=? ORDER BY submitted_at DESC", (status_filter,))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][4], rows[-1][0]])
+
+    counts, _, _ = get_sentence_counts(c)
+
+    sentences = [sentence_to_dict(row) for row in rows]
+    similar = find_similar_ids(c, [sentence['id'] for sentence in sentences])
+    for sentence in sentences:
+        sentence['similar_ids'] = similar[sentence['id']]
+
+    return jsonify({
+        'sentences': sentences,
+        'next_cursor': next_cursor,
+        'pending_count': counts.get('pending', 0)
+    })
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus 文本格式的运行指标（管理员或携带 METRICS_TOKEN）"""
+    authorized = session.get('admin') or (
+        METRICS_TOKEN and request.headers.get('Authorization') == f'Bearer {METRICS_TOKEN}')
+    if not authorized:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    queue = submission_queue.status()
+    extra = (
+        ('sentences_submission_queue_depth', 'gauge', 'Submissions waiting to be moderated.', queue['depth']),
+        ('sentences_submission_queue_lag_seconds', 'gauge', 'Age of the oldest queued submission.',
+         queue['lag_seconds']),
+        ('sentences_db_pool_idle_connections', 'gauge', 'Idle pooled database connections.', len(db_pool._idle)),
+    )
+    if read_snapshot.enabled:
+        snapshot = read_snapshot.status()
+        extra += (
+            ('sentences_read_snapshot_generation', 'gauge', 'Read snapshot generation.', snapshot['generation']),
+            ('sentences_read_snapshot_age_seconds', 'gauge', 'Seconds since the read snapshot was built.',
+             snapshot['age_seconds'] or 0),
+            ('sentences_read_snapshot_build_seconds', 'gauge', 'Time taken by the last snapshot rebuild.',
+             snapshot['build_seconds'] or 0),
+        )
+    extra += (('sentences_load_shed_total', 'counter', 'Requests rejected with 503 because all slots were busy.',
+               load_shed['requests']),)
+    return Response(metrics.render(extra) + rate_limiter.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/admin/queue')
+def get_submission_queue_status():
+    """投稿队列的长度、延迟和处理结果（管理员用）"""
+    if not session.get('admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return jsonify(submission_queue.status())
 
-    sentences = []
-    for row in c.fetchall():
-        sentences.append({
-            'id': row[0],
-            'content': row[1],
-            'author': row[2],
-            'status': row[3],
-            'submitted_at': row[4],
-            'reviewed_at': row[5],
-            'reviewed_by': row[6],
-            'content_hash': row[7]
-        })
 
-    conn.close()
-    return jsonify(sentences)
+def sentences_by_ids_sql(count):
+    """按ID取语句完整信息的 SQL，参数为 count 个语句ID"""
+    return f"SELECT {SENTENCE_COLUMNS} FROM sentences WHERE id IN ({','.join('?' * count)}) ORDER BY id"
+
+
+@app.route('/api/admin/duplicates')
+def get_duplicate_clusters():
+    """近似重复语句分组（管理员用），按组内最小的语句ID分页"""
+    if not session.get('admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    limit = request.args.get('limit', 100, type=int)
+    limit = max(1, min(limit, ADMIN_MAX_PAGE_SIZE))
+    after_id = 0
+    if request.args.get('cursor'):
+        cursor = decode_cursor(request.args['cursor'])
+        if not cursor_value_ok(cursor, int):
+            return jsonify({'error': '无效的分页游标'}), 400
+        after_id = cursor
+
+    conn = get_db()
+    c = conn.cursor()
+
+    clusters, last_id = find_duplicate_clusters_page(c, after_id, limit)
+    result = []
+    for members in clusters:
+        c.execute(sentences_by_ids_sql(len(members)), members)
+        result.append([sentence_to_dict(row) for row in c.fetchall()])
+
+    return jsonify({
+        'clusters': result,
+        'next_cursor': encode_cursor(last_id) if last_id is not None else None
+    })
+
+
+# 审核一条语句，参数为 (状态, 审核时间, 语句ID)
+MODERATE_SQL = "UPDATE sentences SET status=?, reviewed_at=?, reviewed_by='admin' WHERE id=?"
+SENTENCE_BY_ID_SQL = "SELECT content, author FROM sentences WHERE id=?"
+DELETE_SENTENCE_SQL = "DELETE FROM sentences WHERE id = ?"
 
 
 @app.route('/api/admin/review', methods=['POST'])
+@bumps_data_version('sentences', 'approved')
 def review_sentence():
     """审核语句"""
     if not session.get('admin'):
@@ -443,22 +3536,33 @@ def review_sentence():
     sentence_id = data.get('id')
     action = data.get('action')  # 'approve' or 'reject'
 
-    conn = sqlite3.connect('sentences.db')
+    conn = get_db()
     c = conn.cursor()
 
     if action == 'approve':
-        c.execute("UPDATE sentences SET status='approved', reviewed_at=?, reviewed_by='admin' WHERE id=?",
-                  (datetime.now(), sentence_id))
+        c.execute(MODERATE_SQL, ('approved', datetime.now(), sentence_id))
     elif action == 'reject':
-        c.execute("UPDATE sentences SET status='rejected', reviewed_at=?, reviewed_by='admin' WHERE id=?",
-                  (datetime.now(), sentence_id))
+        c.execute(MODERATE_SQL, ('rejected', datetime.now(), sentence_id))
+    updated = c.rowcount > 0
 
     conn.commit()
-    conn.close()
+    if updated:
+        data_changed('sentences')
+
+    leaderboard_cache.clear()
+
+    # 同步随机语句ID池
+    if updated and action == 'approve':
+        c.execute(SENTENCE_BY_ID_SQL, (sentence_id,))
+        content, author = c.fetchone()
+        approved_pool.add(sentence_id, len(content), author)
+    elif updated and action == 'reject':
+        approved_pool.remove(sentence_id)
     return jsonify({'success': True})
 
 
 @app.route('/api/admin/add', methods=['POST'])
+@bumps_data_version('sentences', 'approved')
 def add_sentence():
     """管理员直接添加语句"""
     if not session.get('admin'):
@@ -468,24 +3572,35 @@ def add_sentence():
     author = request.json.get('author', '匿名')
 
     if content:
-        # 检查重复
-        if check_duplicate(content):
-            return jsonify({'success': False, 'error': '该语句已存在'})
+        content_hash = compute_content_hash(content)
 
-        content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-
-        conn = sqlite3.connect('sentences.db')
+        conn = get_db()
         c = conn.cursor()
-        c.execute("INSERT INTO sentences (content, author, status, content_hash) VALUES (?, ?, 'approved', ?)",
-                  (content, author, content_hash))
+
+        # 查重交给 content_hash 的唯一约束，省去一次查询
+        try:
+            c.execute("INSERT INTO sentences (content, author, status, content_hash) VALUES (?, ?, 'approved', ?)",
+                      (content, author, content_hash))
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return jsonify({'success': False, 'error': '该语句已存在'})
+        sentence_id = c.lastrowid
+        fingerprint = compute_simhash(content)
+        index_simhash(c, sentence_id, content, fingerprint)
         conn.commit()
-        conn.close()
-        return jsonify({'success': True})
+        data_changed('sentences')
+        approved_pool.add(sentence_id, len(content), author)
+        leaderboard_cache.clear()
+
+        # 管理员添加不拦截近似重复，只返回相似语句供参考
+        similar_ids = [other_id for other_id, _ in find_similar_sentences(c, fingerprint, exclude_id=sentence_id)]
+        return jsonify({'success': True, 'similar_ids': similar_ids})
 
     return jsonify({'success': False})
 
 
 @app.route('/api/admin/delete', methods=['POST'])
+@bumps_data_version('sentences', 'approved')
 def delete_sentence():
     """删除语句"""
     if not session.get('admin'):
@@ -497,17 +3612,220 @@ def delete_sentence():
     if not sentence_id:
         return jsonify({'success': False, 'error': '缺少语句ID'})
 
-    conn = sqlite3.connect('sentences.db')
+    conn = get_db()
     c = conn.cursor()
 
     try:
-        c.execute("DELETE FROM sentences WHERE id = ?", (sentence_id,))
+        c.execute(DELETE_SENTENCE_SQL, (sentence_id,))
+        deleted = c.rowcount > 0
         conn.commit()
-        conn.close()
+        if deleted:
+            data_changed('sentences')
+        approved_pool.remove(sentence_id)
+        leaderboard_cache.clear()
         return jsonify({'success': True})
     except Exception as e:
-        conn.close()
+        conn.rollback()
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/api/admin/batch', methods=['POST'])
+@bumps_data_version('sentences', 'approved')
+def batch_moderate():
+    """批量通过、拒绝或删除语句，在一个事务内完成"""
+    if not session.get('admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.json or {}
+    action = data.get('action')  # 'approve', 'reject' or 'delete'
+    ids = data.get('ids')
+
+    if action not in ('approve', 'reject', 'delete'):
+        return jsonify({'success': False, 'error': '未知操作'})
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'success': False, 'error': '缺少语句ID'})
+    if len(ids) > BATCH_MAX_IDS:
+        return jsonify({'success': False, 'error': f'一次最多处理 {BATCH_MAX_IDS} 条语句'})
+
+    # 只接受 JSON 整数（不接受 1.5、true 或 "7"）
+    if not all(cursor_value_ok(sentence_id, int) for sentence_id in ids):
+        return jsonify({'success': False, 'error': '语句ID无效'}), 400
+
+    conn = get_db()
+    c = conn.cursor()
+
+    try:
+        if action == 'delete':
+            c.executemany(DELETE_SENTENCE_SQL, [(sentence_id,) for sentence_id in ids])
+        else:
+            status = 'approved' if action == 'approve' else 'rejected'
+            reviewed_at = datetime.now()
+            c.executemany(MODERATE_SQL, [(status, reviewed_at, sentence_id) for sentence_id in ids])
+        affected = c.rowcount
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
         return jsonify({'success': False, 'error': str(e)})
+    if affected:
+        data_changed('sentences')
+
+    approved_pool.refresh()
+    leaderboard_cache.clear()
+
+    return jsonify({'success': True, 'affected': affected})
+
+
+def iter_import_rows(stream, import_format):
+    """逐行解析导入数据，产出 (行号, 内容, 署名)，无法解析的行内容为 None"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if import_format == 'csv' else None)
+
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row.get('content'), row.get('author')
+        return
+
+    for line_no, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield line_no, None, None
+            continue
+        if isinstance(item, str):
+            yield line_no, item, None
+        elif isinstance(item, dict):
+            yield line_no, item.get('content'), item.get('author')
+        else:
+            yield line_no, None, None
+
+
+def content_hashes_sql(count):
+    """按内容哈希批量查找已有语句的 SQL，参数为 count 个哈希，返回 (语句ID, 哈希)"""
+    return f"SELECT id, content_hash FROM sentences WHERE content_hash IN ({','.join('?' * count)})"
+
+
+def import_chunk(c, chunk, status):
+    """导入一块数据：批量查重、检查关键词和近似重复并写入，返回每行的结果"""
+    hashes = [compute_content_hash(content) for _, content, _ in chunk]
+    c.execute(content_hashes_sql(len(hashes)), hashes)
+    seen = {row[1] for row in c.fetchall()}
+
+    results = []
+    rows = []
+    fingerprints = {}
+    for (line_no, content, author), content_hash in zip(chunk, hashes):
+        if content_hash in seen:
+            results.append({'line': line_no, 'result': 'duplicate'})
+            continue
+        seen.add(content_hash)
+
+        keyword_check = check_keywords(content)
+        if keyword_check['has_errors']:
+            results.append({'line': line_no, 'result': 'blocked',
+                            'keywords': [item['keyword'] for item in keyword_check['errors']]})
+            continue
+
+        # 与已有语句或本块中前面的语句近似重复
+        fingerprint = compute_simhash(content)
+        similar = fingerprint is not None and (bool(find_similar_sentences(c, fingerprint)) or any(
+            bin(fingerprint ^ other).count('1') <= NEAR_DUPLICATE_DISTANCE for other in fingerprints.values()))
+        if fingerprint is not None:
+            fingerprints[content_hash] = fingerprint
+
+        # 命中警告关键词或近似重复的语句进入待审核
+        row_status = 'pending' if keyword_check['has_warnings'] or similar else status
+        rows.append((content, author, row_status, content_hash))
+        result = {'line': line_no, 'result': 'inserted', 'status': row_status}
+        if similar:
+            result['similar'] = True
+        results.append(result)
+
+    c.executemany("INSERT OR IGNORE INTO sentences (content, author, status, content_hash) VALUES (?, ?, ?, ?)",
+                  rows)
+
+    if fingerprints:
+        c.execute(content_hashes_sql(len(fingerprints)), list(fingerprints))
+        for sentence_id, content_hash in c.fetchall():
+            index_simhash(c, sentence_id, None, fingerprints[content_hash])
+    return results
+
+
+@app.route('/api/admin/import', methods=['POST'])
+@bumps_data_version('sentences', 'approved')
+def import_sentences():
+    """批量导入语句：上传 NDJSON 或 CSV（content, author 列），流式解析并分块写入"""
+    if not session.get('admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    status = request.args.get('status', 'approved')
+    if status not in ('approved', 'pending'):
+        return jsonify({'success': False, 'error': '导入状态只能是 approved 或 pending'})
+
+    if 'file' in request.files:
+        upload = request.files['file']
+        default_format = 'csv' if upload.filename.lower().endswith('.csv') else 'ndjson'
+        stream = upload.stream
+    else:
+        default_format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+        stream = io.BufferedReader(request.stream)
+    import_format = request.args.get('format', default_format)
+    if import_format not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'error': '导入格式只能是 ndjson 或 csv'})
+
+    conn = get_db()
+    c = conn.cursor()
+
+    results = []
+    chunk = []
+    line_no = committed_line = 0
+    try:
+        for line_no, content, author in iter_import_rows(stream, import_format):
+            content = content.strip() if isinstance(content, str) else ''
+            author = (author.strip() if isinstance(author, str) else '') or '匿名'
+
+            if not content or len(content) > 2000 or len(author) > 50:
+                results.append({'line': line_no, 'result': 'invalid'})
+                continue
+
+            chunk.append((line_no, content, author))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                results.extend(import_chunk(c, chunk, status))
+                conn.commit()
+                data_changed('sentences')
+                committed_line = line_no
+                chunk = []
+
+        if chunk:
+            results.extend(import_chunk(c, chunk, status))
+            conn.commit()
+            data_changed('sentences')
+    except (UnicodeDecodeError, csv.Error) as e:
+        # 之前的块已经提交：返回已写入的条数和已处理到的行号，修正数据后从下一行起重新导入即可
+        conn.rollback()
+        return jsonify({
+            'success': False,
+            'error': f'第 {line_no} 行之后解析失败: {e}',
+            'committed': sum(1 for item in results if item['result'] == 'inserted'),
+            'committed_line': committed_line,
+            'results': [item for item in results if item['line'] <= committed_line]
+        })
+    finally:
+        approved_pool.refresh()
+        leaderboard_cache.clear()
+
+    results.sort(key=lambda item: item['line'])
+    summary = {}
+    for item in results:
+        summary[item['result']] = summary.get(item['result'], 0) + 1
+
+    return jsonify({
+        'success': True,
+        'summary': summary,
+        'results': results
+    })
 
 
 # API文档页面
@@ -523,56 +3841,76 @@ def leaderboard():
     return render_template('leaderboard.html')
 
 
+# 按索引取已通过语句数最多的作者，参数为 LEADERBOARD_EXCLUDED_AUTHORS 加上名次数
+LEADERBOARD_TOP_SQL = f"""
+    SELECT author, approved_count
+    FROM author_stats
+    WHERE author NOT IN ({','.join('?' * len(LEADERBOARD_EXCLUDED_AUTHORS))})
+    ORDER BY approved_count DESC
+    LIMIT ?
+"""
+# 上榜作者总数，参数为 LEADERBOARD_EXCLUDED_AUTHORS
+LEADERBOARD_AUTHORS_SQL = f"""
+    SELECT COUNT(*) FROM author_stats WHERE author NOT IN ({','.join('?' * len(LEADERBOARD_EXCLUDED_AUTHORS))})
+"""
+
+
+def load_leaderboard():
+    """从作者汇总表读取排行榜（前 LEADERBOARD_MAX_LIMIT 名）和统计数据"""
+    # 缓存带上已通过语句的版本号，其他工作进程修改过语句时不会返回旧数据
+    version, _ = read_snapshot.version('approved')
+    cached = leaderboard_cache.get('leaderboard')
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    conn = get_read_db()
+    c = conn.cursor()
+
+    c.execute(LEADERBOARD_TOP_SQL, LEADERBOARD_EXCLUDED_AUTHORS + (LEADERBOARD_MAX_LIMIT,))
+    top_authors = c.fetchall()
+
+    # 获取统计数据 - 只统计已通过的
+    counts, _, _ = get_sentence_counts(c)
+    total_approved_submissions = counts.get('approved', 0)
+
+    c.execute(LEADERBOARD_AUTHORS_SQL, LEADERBOARD_EXCLUDED_AUTHORS)
+    total_authors = c.fetchone()[0]
+
+    result = (top_authors, total_approved_submissions, total_authors)
+    leaderboard_cache.set('leaderboard', (version, result))
+    return result
+
+
 @app.route('/api/leaderboard')
+@conditional('approved', max_age=LEADERBOARD_MAX_AGE)
 def get_leaderboard():
     """获取提交排行榜数据 - 只统计已通过的语句"""
     limit = request.args.get('limit', 20, type=int)
+    if not -SQLITE_MAX_INTEGER - 1 <= limit <= SQLITE_MAX_INTEGER:
+        return jsonify({'error': 'limit 超出范围'}), 400
 
-    conn = sqlite3.connect('sentences.db')
-    c = conn.cursor()
-
-    # 获取已通过审核的语句中提交数最多的作者
-    c.execute("""
-        SELECT author, COUNT(*) as submission_count 
-        FROM sentences 
-        WHERE status = 'approved' 
-          AND author != '匿名' 
-          AND author != '系统'
-        GROUP BY author 
-        ORDER BY submission_count DESC 
-        LIMIT ?
-    """, (limit,))
-
-    results = c.fetchall()
+    top_authors, total_approved_submissions, total_authors = load_leaderboard()
+    if 0 <= limit <= LEADERBOARD_MAX_LIMIT:
+        top_authors = top_authors[:limit]
+    else:
+        # 缓存只有前 LEADERBOARD_MAX_LIMIT 名，更多名次直接查汇总表（与 SQLite 的 LIMIT 一致，负数表示全部）
+        c = get_read_db().cursor()
+        c.execute(LEADERBOARD_TOP_SQL, LEADERBOARD_EXCLUDED_AUTHORS + (limit,))
+        top_authors = c.fetchall()
 
     leaderboard_data = []
-    for rank, (author, count) in enumerate(results, 1):
+    for rank, (author, count) in enumerate(top_authors, 1):
         leaderboard_data.append({
             'rank': rank,
             'author': author,
             'count': count
         })
 
-    # 获取统计数据 - 只统计已通过的
-    c.execute("SELECT COUNT(*) FROM sentences WHERE status = 'approved'")
-    total_approved_submissions = c.fetchone()[0]
-
-    c.execute("""
-        SELECT COUNT(DISTINCT author) 
-        FROM sentences 
-        WHERE status = 'approved' 
-          AND author != '匿名' 
-          AND author != '系统'
-    """)
-    total_authors = c.fetchone()[0]
-
     # 获取最高提交数
     top_submissions = 0
     if leaderboard_data:
         top_submissions = leaderboard_data[0]['count']
 
-    conn.close()
-
     return jsonify({
         'leaderboard': leaderboard_data,
         'stats': {
@@ -583,29 +3921,36 @@ def get_leaderboard():
     })
 
 
+PENDING_COUNT_SQL = "SELECT COUNT(*) FROM sentences WHERE status='pending'"
+APPROVE_ALL_SQL = "UPDATE sentences SET status='approved', reviewed_at=?, reviewed_by='admin' WHERE status='pending'"
+
+
 @app.route('/api/admin/approve-all', methods=['POST'])
+@bumps_data_version('sentences', 'approved')
 def approve_all_pending():
     """一键通过所有待审核语句"""
     if not session.get('admin'):
         return jsonify({'error': 'Unauthorized'}), 401
 
-    conn = sqlite3.connect('sentences.db')
+    conn = get_db()
     c = conn.cursor()
 
     # 获取待审核语句数量
-    c.execute("SELECT COUNT(*) FROM sentences WHERE status='pending'")
+    c.execute(PENDING_COUNT_SQL)
     pending_count = c.fetchone()[0]
 
     if pending_count == 0:
-        conn.close()
         return jsonify({'success': True, 'approved_count': 0})
 
     # 更新所有待审核语句状态为已通过
-    c.execute("UPDATE sentences SET status='approved', reviewed_at=?, reviewed_by='admin' WHERE status='pending'",
-              (datetime.now(),))
+    c.execute(APPROVE_ALL_SQL, (datetime.now(),))
 
     conn.commit()
-    conn.close()
+    data_changed('sentences')
+
+    # 批量变更，ID池按变更日志同步
+    approved_pool.refresh()
+    leaderboard_cache.clear()
 
     return jsonify({
         'success': True,
@@ -614,18 +3959,22 @@ def approve_all_pending():
 
 
 # 关键词管理API
+KEYWORD_LIST_SQL = "SELECT id, keyword, type, message FROM keywords ORDER BY type, keyword"
+DELETE_KEYWORD_SQL = "DELETE FROM keywords WHERE id = ?"
+
+
 @app.route('/api/admin/keywords')
+@conditional('keywords', private=True)
 def get_keywords():
     """获取关键词列表"""
     if not session.get('admin'):
         return jsonify({'error': 'Unauthorized'}), 401
 
-    conn = sqlite3.connect('sentences.db')
+    conn = get_db()
     c = conn.cursor()
 
-    c.execute("SELECT id, keyword, type, message FROM keywords ORDER BY type, keyword")
+    c.execute(KEYWORD_LIST_SQL)
     keywords = c.fetchall()
-    conn.close()
 
     result = {
         'error': [],
@@ -643,6 +3992,7 @@ def get_keywords():
 
 
 @app.route('/api/admin/keywords/add', methods=['POST'])
+@bumps_data_version('keywords')
 def add_keyword():
     """添加关键词"""
     if not session.get('admin'):
@@ -656,21 +4006,23 @@ def add_keyword():
     if not keyword:
         return jsonify({'success': False, 'error': '关键词不能为空'})
 
-    conn = sqlite3.connect('sentences.db')
+    conn = get_db()
     c = conn.cursor()
 
     try:
         c.execute("INSERT INTO keywords (keyword, type, message) VALUES (?, ?, ?)",
                   (keyword, keyword_type, message))
         conn.commit()
-        conn.close()
+        data_changed('keywords')
+        reload_keyword_matcher()
         return jsonify({'success': True})
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
 
 @app.route('/api/admin/keywords/delete', methods=['POST'])
+@bumps_data_version('keywords')
 def delete_keyword():
     """删除关键词"""
     if not session.get('admin'):
@@ -682,19 +4034,270 @@ def delete_keyword():
     if not keyword_id:
         return jsonify({'success': False, 'error': '缺少关键词ID'})
 
-    conn = sqlite3.connect('sentences.db')
+    conn = get_db()
     c = conn.cursor()
 
     try:
-        c.execute("DELETE FROM keywords WHERE id = ?", (keyword_id,))
+        c.execute(DELETE_KEYWORD_SQL, (keyword_id,))
+        deleted = c.rowcount > 0
         conn.commit()
-        conn.close()
+        if deleted:
+            data_changed('keywords')
+        reload_keyword_matcher()
         return jsonify({'success': True})
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/api/admin/keywords/rescan', methods=['POST'])
+def start_keyword_rescan():
+    """启动关键词回溯扫描（mode 为 full 或 incremental）"""
+    if not session.get('admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    mode = (request.json or {}).get('mode', 'incremental')
+    if mode not in ('full', 'incremental'):
+        return jsonify({'success': False, 'error': '扫描模式只能是 full 或 incremental'})
+
+    if not keyword_rescan.start(mode):
+        return jsonify({'success': False, 'error': '已有扫描任务正在运行'})
+    return jsonify({'success': True})
+
+
+# 最近一次扫描任务：按主键取最大ID，不扫描任务表
+KEYWORD_SCAN_LATEST_SQL = """
+    SELECT id, mode, status, keyword_count, total, scanned, hits, error, started_at, finished_at
+    FROM keyword_scans WHERE id = (SELECT MAX(id) FROM keyword_scans)
+"""
+# 命中关键词的语句ID，按ID倒序，参数为 (上一页最后的ID, 条数)；首页也带上界，与翻页共用沿主键的范围查找
+KEYWORD_HIT_IDS_SQL = """
+    SELECT DISTINCT sentence_id FROM keyword_hits
+    WHERE sentence_id < ?
+    ORDER BY sentence_id DESC LIMIT ?
+"""
+
+
+def keyword_hits_sql(count):
+    """取一页语句及其命中关键词的 SQL，参数为 count 个语句ID"""
+    return f"""
+        SELECT s.id, s.content, s.author, s.status, k.id, k.keyword, k.type
+        FROM keyword_hits h
+        JOIN sentences s ON s.id = h.sentence_id
+        JOIN keywords k ON k.id = h.keyword_id
+        WHERE h.sentence_id IN ({','.join('?' * count)})
+        ORDER BY s.id DESC, k.id
+    """
+
+
+@app.route('/api/admin/keywords/rescan')
+def get_keyword_rescan():
+    """最近一次回溯扫描的进度，以及命中关键词的语句（按ID倒序分页）"""
+    if not session.get('admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    limit = request.args.get('limit', ADMIN_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, ADMIN_MAX_PAGE_SIZE))
+    # 首页的上界取 SQLite 整数的最大值
+    before_id = 2 ** 63 - 1
+    if request.args.get('cursor'):
+        cursor = decode_cursor(request.args['cursor'])
+        if not cursor_value_ok(cursor, int):
+            return jsonify({'error': '无效的分页游标'}), 400
+        before_id = cursor
+
+    conn = get_db()
+    c = conn.cursor()
+
+    c.execute(KEYWORD_SCAN_LATEST_SQL)
+    row = c.fetchone()
+    job = None
+    if row:
+        job = dict(zip(('id', 'mode', 'status', 'keyword_count', 'total', 'scanned', 'hits', 'error',
+                        'started_at', 'finished_at'), row))
+
+    c.execute(KEYWORD_HIT_IDS_SQL, (before_id, limit + 1))
+    ids = [r[0] for r in c.fetchall()]
+    next_cursor = encode_cursor(ids[limit - 1]) if len(ids) > limit else None
+    ids = ids[:limit]
+
+    flagged = []
+    if ids:
+        c.execute(keyword_hits_sql(len(ids)), ids)
+        by_id = {}
+        for sentence_id, content, author, status, keyword_id, keyword, keyword_type in c.fetchall():
+            sentence = by_id.get(sentence_id)
+            if sentence is None:
+                sentence = by_id[sentence_id] = {'id': sentence_id, 'content': content, 'author': author,
+                                                 'status': status, 'keywords': []}
+                flagged.append(sentence)
+            sentence['keywords'].append({'id': keyword_id, 'keyword': keyword, 'type': keyword_type})
+
+    return jsonify({
+        'job': job,
+        'running': keyword_rescan.running(),
+        'sentences': flagged,
+        'next_cursor': next_cursor
+    })
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    """空闲的长连接超时后断开，工作进程退出时不会一直等待"""
+    timeout = SERVE_KEEPALIVE_TIMEOUT
+
+
+class PreforkServer:
+    """预先 fork 多个工作进程共享同一个监听端口。父进程只负责监督：
+    工作进程意外退出时重新拉起，SIGHUP 逐个替换工作进程，SIGTERM/SIGINT 通知所有工作进程优雅退出"""
+
+    def __init__(self, sock, workers, graceful_timeout=SERVE_GRACEFUL_TIMEOUT):
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children = {}  # pid -> 工作进程编号
+        self.started = {}  # 工作进程编号 -> 启动时间
+        self.failures = {}  # 工作进程编号 -> 连续启动后很快就退出的次数
+        self.respawns = {}  # 等待重新拉起的工作进程编号 -> 拉起时间
+        self._stopping = False
+        self._reload = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        for index in range(self.workers):
+            self._spawn(index)
+        app.logger.warning('已启动 %d 个工作进程，监听 %s:%d', self.workers, *self.sock.getsockname()[:2])
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._replace_all()
+            now = time.monotonic()
+            for index, due in list(self.respawns.items()):
+                if due <= now:
+                    del self.respawns[index]
+                    self._spawn(index)
+            # 轮询而不是阻塞等待，信号处理函数设置的标志能及时生效
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                if not self.respawns:
+                    break
+                pid = 0
+            if pid == 0:
+                time.sleep(0.2)
+                continue
+            index = self.children.pop(pid, None)
+            if index is not None and not self._stopping:
+                self._schedule_respawn(index, pid, status)
+
+        self._stop_children(list(self.children))
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload = True
+
+    def _schedule_respawn(self, index, pid, status):
+        """安排重新拉起退出的工作进程；启动后很快就退出的（例如启动时出错）按指数退避延迟拉起，避免反复 fork"""
+        if time.monotonic() - self.started[index] < SERVE_MIN_UPTIME:
+            self.failures[index] = self.failures.get(index, 0) + 1
+        else:
+            self.failures[index] = 0
+        delay = 0
+        if self.failures[index]:
+            delay = min(SERVE_RESPAWN_DELAY * 2 ** (self.failures[index] - 1), SERVE_RESPAWN_MAX_DELAY)
+        app.logger.warning('工作进程 %d 退出（状态 %d），%.1f 秒后重新启动', pid, status, delay)
+        self.respawns[index] = time.monotonic() + delay
+
+    def _spawn(self, index):
+        self.started[index] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._serve(index)
+            except BaseException:
+                app.logger.exception('工作进程出错')
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+
+    def _replace_all(self):
+        """逐个用新进程替换旧进程：新进程启动后再让旧进程处理完手上的请求退出"""
+        for pid, index in list(self.children.items()):
+            self.children.pop(pid)
+            self._spawn(index)
+            self._stop_children([pid])
+        app.logger.warning('工作进程已全部替换')
+
+    def _stop_children(self, pids):
+        """通知工作进程优雅退出，超时后强制结束"""
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+            time.sleep(0.05)
+        for pid in remaining:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+    def _serve(self, index):
+        """工作进程：多线程处理请求，收到 SIGTERM 后停止接受新请求，处理完后写入缓冲的计数和投稿"""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        # 只由 0 号工作进程处理投稿队列
+        submission_queue.background = index == 0
+        if submission_queue.background:
+            submission_queue.start()
+
+        host, port = self.sock.getsockname()[:2]
+        server = make_server(host, port, app, threaded=True, request_handler=WorkerRequestHandler,
+                             fd=self.sock.fileno())
+        # 退出时等待处理中的请求完成
+        server.daemon_threads = False
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        server.serve_forever()
+        server.server_close()
+
+        usage_counters.close()
+        submission_queue.close()
+        db_pool.close_all()
+
+
+@app.cli.command('serve')
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', default=5000, show_default=True)
+@click.option('--workers', default=SERVE_WORKERS, show_default=True, help='工作进程数')
+def serve_command(host, port, workers):
+    """生产模式：预先 fork 多个工作进程共享监听端口（SIGHUP 平滑替换工作进程，SIGTERM 优雅退出）"""
+    # 建表和初始数据只在父进程执行一次；fork 前关闭连接，工作进程各自建立连接
+    init_db()
+    db_pool.close_all()
+    data_version.shared = workers > 1
+
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    PreforkServer(sock, workers).run()
+    sock.close()
+
+
 if __name__ == '__main__':
     init_db()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True)
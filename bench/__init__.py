@@ -0,0 +1 @@
+"""性能测试工具：生成合成语料库（corpus）和对本地服务施压并统计延迟（load）"""
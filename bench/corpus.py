@@ -0,0 +1,135 @@
+"""生成合成语料库
+
+用法: python -m bench.corpus --size 100k --out bench-100k.db
+"""
+import argparse
+from itertools import accumulate
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# 状态分布：大部分已通过，少量待审核和已拒绝
+STATUS_WEIGHTS = (('approved', 0.85), ('pending', 0.10), ('rejected', 0.05))
+
+# 常用汉字区间和句中标点
+CJK_START, CJK_END = 0x4E00, 0x9FA5
+PUNCTUATION = '，，，。！？、…'
+
+VOCABULARY_SIZE = 5000
+AUTHOR_COUNT = 5000
+ANONYMOUS_SHARE = 0.3
+KEYWORD_COUNT = 50
+INSERT_BATCH = 5000
+
+
+def vocabulary(seed=0):
+    """固定种子生成的词表（1-4字），压测时用同一词表构造搜索词"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        length = rng.choices((1, 2, 3, 4), weights=(2, 6, 2, 1))[0]
+        words.add(''.join(chr(rng.randint(CJK_START, CJK_END)) for _ in range(length)))
+    return sorted(words)
+
+
+def sentence_length(rng):
+    """对数正态分布的字数：中位数约25字，少量长文，上限2000字"""
+    return max(2, min(2000, int(rng.lognormvariate(math.log(25), 0.9))))
+
+
+def make_sentence(rng, words, weights):
+    target = sentence_length(rng)
+    parts = []
+    length = 0
+    while length < target:
+        word = rng.choices(words, cum_weights=weights)[0]
+        parts.append(word)
+        length += len(word)
+        if rng.random() < 0.12:
+            parts.append(rng.choice(PUNCTUATION))
+            length += 1
+    return ''.join(parts)[:target]
+
+
+def generate(path, size, seed=0, simhash=True):
+    """生成包含 size 条语句的数据库，返回用时（秒）"""
+    if os.path.exists(path):
+        sys.exit(f'{path} 已存在')
+
+    # app 在导入时读取数据库路径
+    os.environ['SENTENCES_DB'] = path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app
+
+    started = time.perf_counter()
+    app.init_db()
+
+    rng = random.Random(seed)
+    words = vocabulary(seed)
+    # 词频服从 Zipf 分布，搜索词有冷有热
+    weights = list(accumulate(1 / (i + 1) for i in range(len(words))))
+    authors = [f'作者{i}' for i in range(AUTHOR_COUNT)]
+    author_weights = list(accumulate(1 / (i + 1) for i in range(len(authors))))
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    status_weights = [weight for _, weight in STATUS_WEIGHTS]
+    now = datetime.now()
+
+    with app.db_pool.connection() as conn:
+        c = conn.cursor()
+        for keyword in rng.sample(words, KEYWORD_COUNT):
+            keyword_type = 'error' if rng.random() < 0.3 else 'warning'
+            c.execute("INSERT INTO keywords (keyword, type, message) VALUES (?, ?, ?)",
+                      (keyword, keyword_type, '压测关键词'))
+
+        inserted = 0
+        while inserted < size:
+            batch = []
+            for _ in range(min(INSERT_BATCH, size - inserted)):
+                content = make_sentence(rng, words, weights)
+                author = '匿名' if rng.random() < ANONYMOUS_SHARE else rng.choices(authors, cum_weights=author_weights)[0]
+                status = rng.choices(statuses, weights=status_weights)[0]
+                submitted_at = now - timedelta(seconds=rng.randint(0, 2 * 365 * 86400))
+                reviewed_at = submitted_at + timedelta(hours=rng.randint(1, 72)) if status != 'pending' else None
+                batch.append((content, author, status, submitted_at, reviewed_at,
+                              'admin' if reviewed_at else None, app.compute_content_hash(content)))
+            c.executemany("""
+                INSERT OR IGNORE INTO sentences (content, author, status, submitted_at, reviewed_at, reviewed_by,
+                                                 content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+            conn.commit()
+            inserted += len(batch)
+            print(f'\r已生成 {inserted}/{size}', end='', flush=True)
+        print()
+
+        if simhash:
+            print('计算 SimHash 指纹...')
+            app.rebuild_simhash_index(c, missing_only=True)
+        c.execute("INSERT INTO sentences_fts (sentences_fts) VALUES ('optimize')")
+        conn.commit()
+        c.execute("ANALYZE")
+    app.db_pool.close_all()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成语料库')
+    parser.add_argument('--size', default='10k', help='10k、100k、1m 或具体条数')
+    parser.add_argument('--out', help='输出数据库路径，默认 bench-<size>.db')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-simhash', action='store_true', help='不计算近似重复指纹（1m 时可省下不少时间）')
+    args = parser.parse_args()
+
+    size = SIZES.get(args.size.lower()) or int(args.size)
+    path = args.out or f'bench-{args.size.lower()}.db'
+    elapsed = generate(path, size, args.seed, simhash=not args.no_simhash)
+    print(f'{path}: {size} 条语句，用时 {elapsed:.1f} 秒')
+
+
+if __name__ == '__main__':
+    main()
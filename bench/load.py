@@ -0,0 +1,209 @@
+"""对本地运行的服务施压，统计每个接口的吞吐量和 p50/p95/p99 延迟
+
+用法: python -m bench.load --url http://127.0.0.1:5000 --concurrency 16 --duration 30 --out results.json
+     python -m bench.load ... --baseline old.json   # 与上次结果对比
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import datetime
+
+from bench.corpus import vocabulary
+
+# 场景 -> 权重，按线上流量大致比例混合
+SCENARIOS = {
+    'random': 30,
+    'random_count': 15,
+    'search': 20,
+    'stats': 10,
+    'leaderboard': 10,
+    'submit': 5,
+    'admin_sentences': 10,
+}
+
+
+class Client:
+    """每个压测线程一个客户端，各自保存登录会话"""
+
+    def __init__(self, base_url, admin_password, words, rng):
+        self.base_url = base_url.rstrip('/')
+        self.words = words
+        self.rng = rng
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.request('POST', '/admin/login', json.dumps({'password': admin_password}).encode(),
+                     {'Content-Type': 'application/json'})
+
+    def request(self, method, path, body=None, headers=None):
+        """发送请求并读完响应体，返回状态码"""
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def keyword(self):
+        # 一半用单个词（多为短词，走 LIKE），一半拼两个词（走全文索引）
+        word = self.rng.choice(self.words)
+        if self.rng.random() < 0.5:
+            word += self.rng.choice(self.words)
+        return urllib.parse.quote(word)
+
+    def run(self, scenario):
+        if scenario == 'random':
+            return self.request('GET', '/api/random')
+        if scenario == 'random_count':
+            return self.request('GET', f'/api/random/{self.rng.randint(1, 50)}')
+        if scenario == 'search':
+            return self.request('GET', f'/api/search?keyword={self.keyword()}')
+        if scenario == 'stats':
+            return self.request('GET', '/api/stats')
+        if scenario == 'leaderboard':
+            return self.request('GET', '/api/leaderboard')
+        if scenario == 'submit':
+            content = ''.join(self.rng.choice(self.words) for _ in range(self.rng.randint(3, 20)))
+            body = urllib.parse.urlencode({'content': content, 'author': '压测'}).encode()
+            return self.request('POST', '/submit', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+        if scenario == 'admin_sentences':
+            status = self.rng.choice(('all', 'pending', 'approved'))
+            return self.request('GET', f'/api/admin/sentences?status={status}')
+        raise ValueError(scenario)
+
+
+def percentile(sorted_values, p):
+    """最近秩法求百分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """samples: [(延迟秒数, 状态码), ...]；4xx（含限流的 429）、5xx 和连接失败（状态码 0）都算错误"""
+    latencies = sorted(latency for latency, _ in samples)
+    statuses = Counter(status for _, status in samples)
+    errors = sum(count for status, count in statuses.items() if status >= 400 or status == 0)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        **{f'p{p}_ms': round(percentile(latencies, p) * 1000, 3) if latencies else None for p in (50, 95, 99)},
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else None,
+    }
+
+
+def run(base_url, concurrency, duration, scenarios, admin_password, seed=0):
+    words = vocabulary(seed)
+    names = list(scenarios)
+    weights = [scenarios[name] for name in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    deadline = started = None
+
+    def start_clock():
+        # 所有线程登录完成后才开始计时
+        nonlocal deadline, started
+        started = time.perf_counter()
+        deadline = started + duration
+
+    start_barrier = threading.Barrier(concurrency + 1, action=start_clock)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url, admin_password, words, rng)
+        local = {name: [] for name in names}
+        start_barrier.wait()
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(names, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                status = client.run(scenario)
+            except (urllib.error.URLError, OSError):
+                status = 0
+            local[scenario].append((time.perf_counter() - started, status))
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'url': base_url,
+        'concurrency': concurrency,
+        'duration': round(elapsed, 3),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'scenarios': scenarios,
+        'total': summarize([sample for values in samples.values() for sample in values], elapsed),
+        'routes': {name: summarize(values, elapsed) for name, values in samples.items() if values},
+    }
+
+
+def compare(result, baseline):
+    """打印与基线结果相比吞吐量和 p95 的变化"""
+    print(f'\n{"route":<18}{"req/s":>28}{"p95 ms":>28}')
+    rows = [('total', result['total'], baseline.get('total'))]
+    rows += [(name, stats, baseline.get('routes', {}).get(name)) for name, stats in result['routes'].items()]
+    for name, stats, old in rows:
+        if not old:
+            continue
+
+        def change(key):
+            if not old.get(key) or stats.get(key) is None:
+                return '-'
+            return f'{old[key]} -> {stats[key]} ({(stats[key] - old[key]) / old[key]:+.1%})'
+        print(f'{name:<18}{change("throughput"):>28}{change("p95_ms"):>28}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对本地服务施压并统计延迟')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='秒')
+    parser.add_argument('--only', help='只压测这些场景，逗号分隔：' + ','.join(SCENARIOS))
+    parser.add_argument('--admin-password', default='your-password-here')
+    parser.add_argument('--seed', type=int, default=0, help='与生成语料库时的种子一致，搜索词才能命中')
+    parser.add_argument('--out', help='结果保存为 JSON')
+    parser.add_argument('--baseline', help='与之前保存的 JSON 结果对比')
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.only:
+        scenarios = {name: SCENARIOS[name] for name in args.only.split(',')}
+
+    result = run(args.url, args.concurrency, args.duration, scenarios, args.admin_password, args.seed)
+
+    print(f'{"route":<18}{"requests":>9}{"errors":>7}{"req/s":>10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for name, stats in [('total', result['total'])] + list(result['routes'].items()):
+        print(f'{name:<18}{stats["requests"]:>9}{stats["errors"]:>7}{stats["throughput"]:>10}'
+              f'{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}')
+    for name, stats in result['routes'].items():
+        if stats['errors']:
+            print(f'{name}: 状态码 {stats["statuses"]}')
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
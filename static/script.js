@@ -23,18 +23,48 @@ document.addEventListener('DOMContentLoaded', function() {
 
     let batchCopyActive = false;
 
+    // 预取的随机语句队列：点击时直接从队列取，余量不足时在后台补充
+    const PREFETCH_BATCH = 10;
+    const PREFETCH_LOW_WATER = 3;
+    const sentenceQueue = [];
+    let refillPromise = null;
+
+    function refillQueue() {
+        if (!refillPromise) {
+            refillPromise = fetch(`/api/random/batch?count=${PREFETCH_BATCH}`)
+                .then(response => response.json())
+                .then(data => {
+                    sentenceQueue.push(...data.sentences);
+                    renderStats(data.stats);
+                })
+                .finally(() => {
+                    refillPromise = null;
+                });
+        }
+        return refillPromise;
+    }
+
     async function getRandomSentence() {
         try {
-            const response = await fetch('/api/random');
-            const data = await response.json();
-            sentenceElement.textContent = data.sentence;
-            authorElement.textContent = `—— ${data.author}`;
+            if (sentenceQueue.length === 0) {
+                await refillQueue();
+            }
+
+            const item = sentenceQueue.shift();
+            if (item) {
+                sentenceElement.textContent = item.content;
+                authorElement.textContent = `—— ${item.author}`;
+            } else {
+                sentenceElement.textContent = '暂无语句，欢迎提交！';
+                authorElement.textContent = '—— 系统';
+            }
 
             // 根据语句长度调整字体大小
-            adjustFontSize(data.sentence);
+            adjustFontSize(sentenceElement.textContent);
 
-            // 获取最新统计数据
-            updateStats();
+            if (sentenceQueue.length < PREFETCH_LOW_WATER) {
+                refillQueue().catch(error => console.error('预取语句失败:', error));
+            }
         } catch (error) {
             console.error('获取语句失败:', error);
             sentenceElement.textContent = '获取语句失败，请重试...';
@@ -58,24 +88,17 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // 获取真实统计数据
-    async function updateStats() {
-        try {
-            const response = await fetch('/api/stats');
-            const data = await response.json();
-
-            const totalCount = document.getElementById('total-count');
-            const todayCount = document.getElementById('today-count');
-            const pendingCount = document.getElementById('pending-count');
-            const apiCount = document.getElementById('api-count');
-
-            if (totalCount) totalCount.textContent = data.total_sentences;
-            if (todayCount) todayCount.textContent = data.today_views;
-            if (pendingCount) pendingCount.textContent = data.pending_sentences;
-            if (apiCount) apiCount.textContent = data.today_api_calls;
-        } catch (error) {
-            console.error('获取统计数据失败:', error);
-        }
+    // 显示统计数据
+    function renderStats(data) {
+        const totalCount = document.getElementById('total-count');
+        const todayCount = document.getElementById('today-count');
+        const pendingCount = document.getElementById('pending-count');
+        const apiCount = document.getElementById('api-count');
+
+        if (totalCount) totalCount.textContent = data.total_sentences;
+        if (todayCount) todayCount.textContent = data.today_views;
+        if (pendingCount) pendingCount.textContent = data.pending_sentences;
+        if (apiCount) apiCount.textContent = data.today_api_calls;
     }
 
     // 复制到剪贴板功能 - 修改为只复制语句内容
@@ -304,8 +327,10 @@ document.addEventListener('DOMContentLoaded', function() {
         batchCancelBtn.addEventListener('click', cancelBatchCopy);
     }
 
-    // 页面加载时自动获取一句和统计数据
-    getRandomSentence();
+    // 首页由服务端直接渲染了第一句和统计数据，否则在加载时获取
+    if (sentenceElement && sentenceElement.dataset.rendered !== 'true') {
+        getRandomSentence();
+    }
 });
 
 // 管理后台功能
@@ -420,11 +445,49 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // 加载语句列表
+    // 加载语句列表（分页加载，滚动到底部时自动加载下一页）
+    let nextCursor = null;
+    let loadingPage = false;
+    let loadGeneration = 0;
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    const searchTextInput = document.getElementById('sentence-search-text');
+    const searchAuthorInput = document.getElementById('sentence-search-author');
+
     async function loadSentences() {
+        loadGeneration++;
+        nextCursor = null;
+        loadingPage = false;
+
+        const listElement = document.getElementById('sentences-list');
+        if (!listElement) {
+            console.error('找不到语句列表元素');
+            return;
+        }
+        listElement.innerHTML = '';
+
+        await loadSentencePage(true);
+    }
+
+    async function loadSentencePage(firstPage) {
+        if (loadingPage || (!firstPage && !nextCursor)) {
+            return;
+        }
+        loadingPage = true;
+        const generation = loadGeneration;
+
         try {
-            console.log('正在加载语句...');
-            const response = await fetch(`/api/admin/sentences?status=${currentFilter}`);
+            const params = new URLSearchParams({ status: currentFilter });
+            if (searchTextInput && searchTextInput.value.trim()) {
+                params.set('q', searchTextInput.value.trim());
+            }
+            if (searchAuthorInput && searchAuthorInput.value.trim()) {
+                params.set('author', searchAuthorInput.value.trim());
+            }
+            if (!firstPage) {
+                params.set('cursor', nextCursor);
+            }
+
+            const response = await fetch(`/api/admin/sentences?${params}`);
 
             if (response.status === 401) {
                 // 未授权，显示登录界面
@@ -437,36 +500,66 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const sentences = await response.json();
-            console.log('加载到的语句:', sentences);
+            const data = await response.json();
+
+            // 筛选条件已变化，丢弃旧结果
+            if (generation !== loadGeneration) {
+                return;
+            }
 
             // 更新待审核数量
-            pendingCount = sentences.filter(s => s.status === 'pending').length;
+            pendingCount = data.pending_count;
             updateApproveAllButton();
 
             const listElement = document.getElementById('sentences-list');
-            if (!listElement) {
-                console.error('找不到语句列表元素');
-                return;
-            }
 
-            listElement.innerHTML = '';
-
-            if (sentences.length === 0) {
+            if (firstPage && data.sentences.length === 0) {
                 listElement.innerHTML = '<div class="sentence-item">暂无语句</div>';
-                return;
             }
 
-            sentences.forEach(sentence => {
+            data.sentences.forEach(sentence => {
                 const sentenceElement = createSentenceElement(sentence);
                 listElement.appendChild(sentenceElement);
             });
+
+            nextCursor = data.next_cursor;
+            if (loadMoreBtn) {
+                loadMoreBtn.style.display = nextCursor ? 'block' : 'none';
+            }
         } catch (error) {
             console.error('加载语句失败:', error);
             alert('加载语句失败: ' + error.message);
+        } finally {
+            if (generation === loadGeneration) {
+                loadingPage = false;
+            }
+        }
+    }
+
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', () => loadSentencePage(false));
+
+        // 加载更多按钮进入视口时自动加载下一页
+        if ('IntersectionObserver' in window) {
+            const observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    loadSentencePage(false);
+                }
+            });
+            observer.observe(loadMoreBtn);
         }
     }
 
+    [searchTextInput, searchAuthorInput].forEach(input => {
+        if (input) {
+            input.addEventListener('keypress', function(e) {
+                if (e.key === 'Enter') {
+                    loadSentences();
+                }
+            });
+        }
+    });
+
     // 加载关键词列表
     async function loadKeywords() {
         try {
@@ -568,10 +661,11 @@ document.addEventListener('DOMContentLoaded', function() {
             <div class="sentence-content-admin">
                 <div>${escapeHtml(sentence.content)}</div>
                 <div class="sentence-meta">
-                    作者: ${escapeHtml(sentence.author)} | 
+                    #${sentence.id} | 作者: ${escapeHtml(sentence.author)} | 
                     提交时间: ${new Date(sentence.submitted_at).toLocaleString()}
                     ${sentence.reviewed_at ? ` | 审核时间: ${new Date(sentence.reviewed_at).toLocaleString()}` : ''}
                     ${sentence.reviewed_by ? ` | 审核人: ${sentence.reviewed_by}` : ''}
+                    ${sentence.similar_ids && sentence.similar_ids.length ? ` | 近似重复: ${sentence.similar_ids.map(id => '#' + id).join(', ')}` : ''}
                 </div>
             </div>
             <div class="sentence-actions">
@@ -0,0 +1,40 @@
+"""查询计划检查：各接口的查询都使用预期的索引，没有意外的全表扫描
+
+用法: python -m unittest
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+# 数据库路径在导入 app 时读取，先指向临时目录中的仓库数据库副本，不改动仓库中的文件
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMP_DIR = tempfile.mkdtemp(prefix='sentences-test-')
+shutil.copy(os.path.join(ROOT, 'sentences.db'), TEMP_DIR)
+os.environ['SENTENCES_DB'] = os.path.join(TEMP_DIR, 'sentences.db')
+
+import app  # noqa: E402
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+class QueryPlanTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app.init_db()
+
+    def test_all_queries_use_indexes(self):
+        with app.db_pool.connection() as conn:
+            results = app.run_query_plan_checks(conn)
+        self.assertEqual({name: problems for name, _, problems in results if problems}, {})
+
+    def test_full_scan_is_reported(self):
+        self.assertTrue(app.query_plan_problems(['SCAN sentences'], ('idx_sentences_submitted',)))
+        self.assertFalse(app.query_plan_problems(['SCAN sentences'], ('SCAN sentences',)))
+
+
+if __name__ == '__main__':
+    unittest.main()